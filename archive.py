@@ -0,0 +1,146 @@
+"""
+Hot/cold archival of rental history.
+
+Rentals that are over (completed or canceled) and ended before a cutoff move
+to RentalsArchive, together with their payments, which move to
+PaymentsArchive. Reviews written before the cutoff move to ReviewsArchive.
+The archive tables have the same columns and keys as the hot tables, so
+the hot tables stay small for the booking and sweep queries. Anything that
+needs the whole history reads `combined(...)`, a UNION ALL of both.
+
+Archival runs as sweeps (see sweeps.py): each chunk of primary keys is one
+transaction that copies the chunk's eligible rows, checks by row count that
+every one of them is in the archive, deletes them from the hot table and
+advances the checkpoint. A chunk whose counts don't match raises
+ArchiveMismatch and is rolled back whole. Copies skip rows already in the
+archive, so re-running a chunk, or a pass after a crash, is harmless.
+
+A rental that still has a pending payment stays hot until the payment is
+settled. The derived tables (ProductStats, RelatedProducts, ProductSearch)
+describe the whole history: archiving leaves them as they are, and their
+rebuilds read hot and archived rows alike.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, func, not_, select, union_all
+
+from sweeps import Sweep
+
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+
+# hot table -> its archive
+ARCHIVE_TABLES = {
+    'Rentals': 'RentalsArchive',
+    'Payments': 'PaymentsArchive',
+    'Reviews': 'ReviewsArchive',
+}
+
+
+class ArchiveMismatch(RuntimeError):
+    """The rows copied to an archive table don't add up to the rows about to be deleted."""
+
+
+def combined(tables, name, columns, label=None):
+    """`columns` of hot table `name` and its archive, as one UNION ALL subquery."""
+    hot, cold = tables[name], tables[ARCHIVE_TABLES[name]]
+    return union_all(select(*(hot.c[col] for col in columns)),
+                     select(*(cold.c[col] for col in columns))).subquery(label or f'{name}History')
+
+
+def _waited(cutoff, oldest):
+    """Seconds the oldest row moved had been past the cutoff, or None."""
+    if oldest is None:
+        return None
+    if not isinstance(oldest, datetime):
+        oldest = datetime.combine(oldest, datetime.min.time())
+    return max((datetime.combine(cutoff, datetime.min.time()) - oldest).total_seconds(), 0.0)
+
+
+def _move(conn, hot, cold, key, ids):
+    """
+    Copy the rows of `hot` with `key` in `ids` to `cold` (skipping any already
+    there), check that all of them are, and delete them from `hot`.
+    """
+    k, ck = hot.c[key], cold.c[key]
+    columns = [c.name for c in hot.columns]
+    conn.execute(cold.insert().from_select(columns, select(*hot.columns).where(
+        k.in_(ids), not_(exists().where(ck == k)))))
+    copied = conn.execute(select(func.count()).select_from(cold).where(ck.in_(ids))).scalar()
+    if copied != len(ids):
+        raise ArchiveMismatch(f"{cold.name} holds {copied} of {len(ids)} {hot.name} rows to archive")
+    deleted = conn.execute(hot.delete().where(k.in_(ids))).rowcount
+    if deleted != len(ids):
+        raise ArchiveMismatch(f"deleted {deleted} of {len(ids)} {hot.name} rows archived")
+
+
+def archive_rentals_chunk(conn, tables, lo, hi, today, now, cutoff):
+    rentals, payments = tables['Rentals'], tables['Payments']
+    r, p = rentals.c, payments.c
+    pending = exists().where(p.rental_id == r.rental_id, p.payment_status == 'pending')
+    # FOR UPDATE keeps payments for these rentals from being added until the chunk commits
+    rows = conn.execute(select(r.rental_id, r.rental_end).where(
+               r.rental_id > lo, r.rental_id <= hi, r.status.in_(('completed', 'canceled')),
+               r.rental_end < cutoff, not_(pending)).with_for_update()).all()
+    if not rows:
+        return 0, {'rentals': 0, 'payments': 0}, None
+    rental_ids = [rental_id for rental_id, _ in rows]
+    payment_ids = conn.execute(select(p.payment_id).where(p.rental_id.in_(rental_ids))).scalars().all()
+    # payments first: the rentals' ON DELETE CASCADE would take them unarchived
+    if payment_ids:
+        _move(conn, payments, tables['PaymentsArchive'], 'payment_id', payment_ids)
+    _move(conn, rentals, tables['RentalsArchive'], 'rental_id', rental_ids)
+    lag = _waited(cutoff, min(end for _, end in rows))
+    return len(rental_ids) + len(payment_ids), {'rentals': len(rental_ids), 'payments': len(payment_ids)}, lag
+
+
+def archive_reviews_chunk(conn, tables, lo, hi, today, now, cutoff):
+    reviews = tables['Reviews']
+    c = reviews.c
+    rows = conn.execute(select(c.review_id, c.review_date).where(
+               c.review_id > lo, c.review_id <= hi,
+               c.review_date < datetime.combine(cutoff, datetime.min.time()))).all()
+    if not rows:
+        return 0, {'reviews': 0}, None
+    _move(conn, reviews, tables['ReviewsArchive'], 'review_id', [review_id for review_id, _ in rows])
+    return len(rows), {'reviews': len(rows)}, _waited(cutoff, min(when for _, when in rows))
+
+
+ARCHIVES = {
+    'archive_rentals': Sweep('archive_rentals', 'Rentals', 'rental_id', archive_rentals_chunk,
+                             "Move finished rentals past the horizon, and their payments, to the archive",
+                             writes=('Rentals', 'Payments', 'RentalsArchive', 'PaymentsArchive')),
+    'archive_reviews': Sweep('archive_reviews', 'Reviews', 'review_id', archive_reviews_chunk,
+                             "Move reviews older than the horizon to the archive",
+                             writes=('Reviews', 'ReviewsArchive')),
+}
+
+
+def cutoff_for(today, after_days):
+    """Rows that ended (or were written) before this date are archived."""
+    return today - timedelta(days=after_days)
+
+
+def verify(conn, tables, cutoff):
+    """
+    [(table, hot rows, archived rows, rows in both, hot rows still due)]:
+    rows in both would be counted twice by `combined`, and rows still due
+    are what the next archive run has left to move.
+    """
+    due = {
+        'Rentals': lambda c: and_(c.status.in_(('completed', 'canceled')), c.rental_end < cutoff),
+        'Payments': None,
+        'Reviews': lambda c: c.review_date < datetime.combine(cutoff, datetime.min.time()),
+    }
+    report = []
+    for name, archive_name in ARCHIVE_TABLES.items():
+        hot, cold = tables[name], tables[archive_name]
+        key = hot.primary_key.columns.values()[0].name
+        hot_rows = conn.execute(select(func.count()).select_from(hot)).scalar()
+        cold_rows = conn.execute(select(func.count()).select_from(cold)).scalar()
+        both = conn.execute(select(func.count()).select_from(
+                   hot.join(cold, cold.c[key] == hot.c[key]))).scalar()
+        still_due = (conn.execute(select(func.count()).select_from(hot).where(due[name](hot.c))).scalar()
+                     if due[name] else None)
+        report.append((name, hot_rows, cold_rows, both, still_due))
+    return report
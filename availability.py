@@ -0,0 +1,160 @@
+"""
+Date-range availability for rentable products.
+
+Each product has a ProductCalendar: a step function over days holding how many
+units are booked from each boundary day until the next one. "How many units
+are booked at peak during [start, end)" is a bisect to the first step plus a
+walk over the steps inside the range, i.e. O(log n + k) for n steps of which
+k fall inside the range. Only ongoing rentals occupy units; a rental occupies
+[rental_start, rental_end), so the return day is free for the next renter.
+
+AvailabilityIndex holds one calendar per product together with the product's
+category, name, price and capacity (available_quantity), so a category search
+never touches the database.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+
+class ProductCalendar:
+    def __init__(self, intervals=()):
+        """`intervals` are (start, end) pairs of date ordinals, one unit each."""
+        deltas = {}
+        for start, end in intervals:
+            if start < end:
+                deltas[start] = deltas.get(start, 0) + 1
+                deltas[end] = deltas.get(end, 0) - 1
+        self.bounds = []
+        self.counts = []
+        running = 0
+        for day in sorted(deltas):
+            running += deltas[day]
+            if self.counts and self.counts[-1] == running:
+                continue
+            self.bounds.append(day)
+            self.counts.append(running)
+
+    def booked(self, start, end):
+        """Peak number of units booked on any day in [start, end)."""
+        i = bisect_right(self.bounds, start) - 1
+        peak = self.counts[i] if i >= 0 else 0
+        i += 1
+        while i < len(self.bounds) and self.bounds[i] < end:
+            if self.counts[i] > peak:
+                peak = self.counts[i]
+            i += 1
+        return peak
+
+    def _split(self, day):
+        """Make `day` a step boundary and return its position."""
+        i = bisect_left(self.bounds, day)
+        if i < len(self.bounds) and self.bounds[i] == day:
+            return i
+        self.bounds.insert(i, day)
+        self.counts.insert(i, self.counts[i - 1] if i > 0 else 0)
+        return i
+
+    def add(self, start, end, units=1):
+        """Book (or, with negative units, release) `units` over [start, end)."""
+        if start >= end:
+            return
+        lo = self._split(start)
+        hi = self._split(end)
+        for i in range(lo, hi):
+            self.counts[i] += units
+        # merge steps that became equal to their left neighbour
+        for i in (hi, lo):
+            if 0 < i < len(self.bounds) and self.counts[i] == self.counts[i - 1]:
+                del self.bounds[i]
+                del self.counts[i]
+        if self.counts and self.counts[0] == 0:
+            del self.bounds[0]
+            del self.counts[0]
+
+
+def peak_booked(intervals, start, end):
+    """Peak concurrent bookings over [start, end) for a one-off list of date pairs."""
+    calendar = ProductCalendar((s.toordinal(), e.toordinal()) for s, e in intervals)
+    return calendar.booked(start.toordinal(), end.toordinal())
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.products = {}      # product_id -> (category, name, rental_price, capacity)
+        self.calendars = {}     # product_id -> ProductCalendar
+        self.by_category = {}   # category -> {product_id: None}, in listing order
+        self.loaded = False
+        self.loaded_at = None
+
+    def load(self, products, rentals):
+        """
+        Replace the index contents. `products` yields (product_id, category,
+        name, rental_price, available_quantity); `rentals` yields
+        (product_id, rental_start, rental_end) for ongoing rentals.
+        """
+        meta, by_category, intervals = {}, {}, {}
+        for product_id, category, name, price, quantity in products:
+            meta[product_id] = (category, name, price, quantity)
+            by_category.setdefault(category, {})[product_id] = None
+        for product_id, start, end in rentals:
+            intervals.setdefault(product_id, []).append((start.toordinal(), end.toordinal()))
+        calendars = {pid: ProductCalendar(ivs) for pid, ivs in intervals.items()}
+        with self._lock:
+            self.products, self.by_category, self.calendars = meta, by_category, calendars
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def put_product(self, product_id, category, name, price, quantity):
+        with self._lock:
+            old = self.products.get(product_id)
+            if old and old[0] != category:
+                self.by_category.get(old[0], {}).pop(product_id, None)
+            self.products[product_id] = (category, name, price, quantity)
+            self.by_category.setdefault(category, {})[product_id] = None
+
+    def drop_product(self, product_id):
+        with self._lock:
+            old = self.products.pop(product_id, None)
+            if old:
+                self.by_category.get(old[0], {}).pop(product_id, None)
+            self.calendars.pop(product_id, None)
+
+    def book(self, product_id, start, end, units=1):
+        with self._lock:
+            calendar = self.calendars.get(product_id)
+            if calendar is None:
+                calendar = self.calendars[product_id] = ProductCalendar()
+            calendar.add(start.toordinal(), end.toordinal(), units)
+
+    def release(self, product_id, start, end):
+        self.book(product_id, start, end, -1)
+
+    def free_units(self, product_id, start, end):
+        with self._lock:
+            meta = self.products.get(product_id)
+            if meta is None:
+                return 0
+            calendar = self.calendars.get(product_id)
+            booked = calendar.booked(start.toordinal(), end.toordinal()) if calendar else 0
+            return max(meta[3] - booked, 0)
+
+    def search(self, category, start, end, held=()):
+        """
+        (product_id, name, rental_price, free_units) for every product in
+        `category` with at least one unit free for the whole of [start, end),
+        in listing order. Products in `held` (e.g. out for cleaning) are left out.
+        """
+        s, e = start.toordinal(), end.toordinal()
+        found = []
+        with self._lock:
+            for product_id in self.by_category.get(category, ()):
+                if product_id in held:
+                    continue
+                _, name, price, quantity = self.products[product_id]
+                calendar = self.calendars.get(product_id)
+                free = quantity - (calendar.booked(s, e) if calendar else 0)
+                if free > 0:
+                    found.append((product_id, name, price, free))
+        return found
@@ -0,0 +1,421 @@
+"""
+Benchmark and load-test every route in app.py at several data scales.
+
+For each scale a database is seeded once (SQLite files under --workdir, or the
+database given by --db-url) and every route is driven through the Flask test
+client: first sequentially, to measure latency percentiles, SQL statements per
+request and peak RSS, then from --concurrency threads for throughput. Each
+scale runs in its own process so the in-process caches and indexes start cold.
+Worker cold start is measured in one more fresh process per scale: the time to
+import app.py, to build the app, and to serve the first page and first query.
+
+benchmark_baseline.json, tracked in the repository, is the reference report
+for the small scale, startup included; refresh it with --out when a change
+is meant to move the numbers.
+
+Usage:
+    python benchmark.py run --scales small
+    python benchmark.py compare benchmark_baseline.json .bench/current.json --threshold 0.2
+    python benchmark.py run --scales small --out benchmark_baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+
+SCALES = {
+    'small': {'users': 1000, 'products': 2000, 'rentals': 10000, 'payments': 2000, 'reviews': 5000},
+    'medium': {'users': 10000, 'products': 20000, 'rentals': 100000, 'payments': 20000, 'reviews': 50000},
+    'large': {'users': 100000, 'products': 200000, 'rentals': 1000000, 'payments': 200000, 'reviews': 500000},
+}
+
+# Metrics compared by `compare`: (key, True when a higher value is worse)
+COMPARED = [
+    ('p50_ms', True),
+    ('p95_ms', True),
+    ('p99_ms', True),
+    ('throughput_rps', False),
+    ('statements', True),
+    ('import_ms', True),
+    ('create_app_ms', True),
+    ('first_response_ms', True),
+    ('first_query_ms', True),
+]
+
+
+#########################################
+# MEASUREMENT HELPERS
+#########################################
+
+def _reset_peak_rss():
+    # Linux lets a process reset its high-water mark; elsewhere peak RSS is
+    # the process-wide maximum so far.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+#########################################
+# ROUTE SCENARIOS
+#########################################
+
+def _scenarios(app, db):
+    """
+    (name, method, path, form data factory or None, needs login) for every
+    route. Write routes get fresh form data on each call so they keep
+    exercising the insert path.
+    """
+    from app import User, Product
+
+    with app.app_context():
+        user = User.query.first()
+        product = Product.query.order_by(Product.product_id).first()
+    credentials = {'email': user.email, 'password': user.password}
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def unique():
+        with lock:
+            return next(counter)
+
+    def register_form():
+        n = time.time_ns() + unique()
+        return {'name': f'Bench {n}', 'email': f'bench{n}@example.com',
+                'phone': f'+{n}', 'password': 'bench', 'role': 'renter'}
+
+    def rent_item_form():
+        return {'name': f'Bench Item {unique()}', 'category': 'mens', 'sub_category': 'tuxedo',
+                'rental_price': '99.00', 'available_quantity': '1000000'}
+
+    def book_form():
+        start = date.today() + timedelta(days=365 + unique() % 1000)
+        return {'product_id': product.product_id, 'start': start.isoformat(),
+                'end': (start + timedelta(days=3)).isoformat()}
+
+    analytics = sorted(rule.rule[len('/query_'):] for rule in app.url_map.iter_rules()
+                       if rule.rule.startswith('/query_'))
+    start = (date.today() + timedelta(days=30)).isoformat()
+    end = (date.today() + timedelta(days=33)).isoformat()
+    scenarios = []
+    # query strings a route needs, and real values for the rules with arguments
+    special = {
+        '/available_products': f'/available_products?category=mens&start={start}&end={end}',
+        '/search': '/search?category=womens&min_price=100&max_price=900&in_stock=1',
+        '/text_search': '/text_search?q=casu',
+        '/owner_earnings': f'/owner_earnings?user_id={product.owner_id}',
+        '/products/<int:product_id>/related': f'/products/{product.product_id}/related',
+        '/api/queries/<name>': '/api/queries/top_revenue',
+    }
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint == 'static' or 'GET' not in rule.methods:
+            continue
+        if rule.arguments and rule.rule not in special:
+            continue
+        path = special.get(rule.rule, rule.rule)
+        scenarios.append((f'GET {rule.rule}', 'GET', path, None, rule.rule in ('/rent_item',)))
+    scenarios += [
+        ('POST /login', 'POST', '/login', lambda: credentials, False),
+        ('POST /register', 'POST', '/register', register_form, False),
+        ('POST /rent_item', 'POST', '/rent_item', rent_item_form, True),
+        ('POST /book', 'POST', '/book', book_form, True),
+        ('POST /api/queries/batch', 'POST', '/api/queries/batch', lambda: {'queries': analytics}, False),
+    ]
+    return scenarios, user.user_id
+
+
+def _client(app, user_id, login):
+    client = app.test_client()
+    if login:
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+    return client
+
+
+#########################################
+# ONE SCALE (runs in a child process)
+#########################################
+
+def run_scale(scale, db_url, iterations, concurrency, requests_per_thread, use_cache, reseed, workers):
+    from app import create_app, db, result_cache, init_db, populate_dummy_data
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_url})
+    with app.app_context():
+        if reseed:
+            db.drop_all()
+        init_db()
+        started = time.perf_counter()
+        if populate_dummy_data(SCALES[scale], seed=42, workers=workers):
+            print(f"[{scale}] seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        engine = db.engine
+
+    counter = StatementCounter(engine)
+    scenarios, user_id = _scenarios(app, db)
+    tables = list(db.metadata.tables.keys())
+
+    def call(client, method, path, form):
+        if not use_cache:
+            result_cache.invalidate(tables)
+        started = time.perf_counter()
+        if method == 'GET':
+            response = client.get(path)
+        elif path.startswith('/api/'):
+            response = client.post(path, json=form())
+        else:
+            response = client.post(path, data=form())
+        elapsed = time.perf_counter() - started
+        # an error page is not a latency sample
+        if not 200 <= response.status_code < 400:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}")
+        return elapsed
+
+    results = {}
+    for name, method, path, form, login in scenarios:
+        client = _client(app, user_id, login)
+        try:
+            call(client, method, path, form)  # warm-up
+            _reset_peak_rss()
+            statements_before = counter.count
+            latencies = [call(client, method, path, form) for _ in range(iterations)]
+        except RuntimeError as exc:
+            results[name] = {'failed': str(exc)}
+            print(f"[{scale}] {name}: FAILED, {exc}", file=sys.stderr)
+            continue
+        statements = (counter.count - statements_before) / iterations
+        peak_rss = _peak_rss_kb()
+
+        errors = []
+
+        def worker():
+            c = _client(app, user_id, login)
+            try:
+                for _ in range(requests_per_thread):
+                    call(c, method, path, form)
+            except Exception as exc:  # reported, not fatal for the other routes
+                errors.append(repr(exc))
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        results[name] = {
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+            'throughput_rps': round(concurrency * requests_per_thread / wall, 1) if not errors else 0.0,
+            'statements': round(statements, 2),
+            'peak_rss_kb': peak_rss,
+        }
+        if errors:
+            results[name]['errors'] = errors[:3]
+        print(f"[{scale}] {name}: p95 {results[name]['p95_ms']}ms, "
+              f"{results[name]['throughput_rps']} req/s, {statements:.1f} stmts", file=sys.stderr)
+    return results
+
+
+def measure_startup(db_url):
+    """Cold-start timings of a fresh worker process against a seeded database."""
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_url})
+    created = time.perf_counter()
+    client = app.test_client()
+    client.get('/')
+    first_response = time.perf_counter()
+    client.get('/query_renters')
+    first_query = time.perf_counter()
+    return {
+        'import_ms': round((imported - started) * 1000, 3),
+        'create_app_ms': round((created - imported) * 1000, 3),
+        'first_response_ms': round((first_response - created) * 1000, 3),
+        'first_query_ms': round((first_query - first_response) * 1000, 3),
+        'peak_rss_kb': _peak_rss_kb(),
+        # the data generator should stay out of serving workers
+        'faker_imported': 'faker' in sys.modules,
+    }
+
+
+#########################################
+# COMMANDS
+#########################################
+
+def cmd_run(args):
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    for scale in scales:
+        if scale not in SCALES:
+            sys.exit(f"unknown scale {scale!r} (choose from {', '.join(SCALES)})")
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+              'settings': {'iterations': args.iterations, 'concurrency': args.concurrency,
+                           'requests_per_thread': args.requests_per_thread, 'cache': args.cache},
+              'scales': {}}
+    for scale in scales:
+        db_url = args.db_url or 'sqlite:///' + os.path.abspath(os.path.join(args.workdir, f'bench_{scale}.db'))
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            out = tmp.name
+        cmd = [sys.executable, os.path.abspath(__file__), '_scale', scale, db_url, out,
+               '--iterations', str(args.iterations), '--concurrency', str(args.concurrency),
+               '--requests-per-thread', str(args.requests_per_thread), '--workers', str(args.workers)]
+        if args.cache:
+            cmd.append('--cache')
+        # one shared --db-url has to be reloaded for every scale
+        if args.reseed or args.db_url:
+            cmd.append('--reseed')
+        subprocess.run(cmd, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(out) as f:
+            report['scales'][scale] = json.load(f)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '_startup', db_url, out],
+                       check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(out) as f:
+            report['scales'][scale]['startup'] = json.load(f)
+        os.unlink(out)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"wrote {args.out}")
+
+
+def cmd_scale(args):
+    results = run_scale(args.scale, args.db_url, args.iterations, args.concurrency,
+                        args.requests_per_thread, args.cache, args.reseed, args.workers)
+    with open(args.out, 'w') as f:
+        json.dump(results, f)
+
+
+def cmd_startup(args):
+    with open(args.out, 'w') as f:
+        json.dump(measure_startup(args.db_url), f)
+
+
+def compare(baseline, current, threshold):
+    """
+    [(scale, route, metric, old, new)] for metrics that got worse by more than
+    threshold, and for routes that failed (metric 'failed') that didn't before.
+    """
+    regressions = []
+    for scale, routes in current['scales'].items():
+        for route, metrics in routes.items():
+            old = baseline.get('scales', {}).get(scale, {}).get(route)
+            if metrics.get('failed') and not (old or {}).get('failed'):
+                regressions.append((scale, route, 'failed', None, metrics['failed']))
+                continue
+            if metrics.get('faker_imported') and old is not None and not old.get('faker_imported'):
+                regressions.append((scale, route, 'faker_imported', False, True))
+            if not old:
+                continue
+            for key, higher_is_worse in COMPARED:
+                a, b = old.get(key), metrics.get(key)
+                if a is None or b is None:
+                    continue
+                if higher_is_worse:
+                    worse = b > a * (1 + threshold) if key != 'statements' else b > a
+                else:
+                    worse = b < a * (1 - threshold)
+                if worse:
+                    regressions.append((scale, route, key, a, b))
+    return regressions
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for scale, route, key, a, b in regressions:
+        print(f"REGRESSION [{scale}] {route} {key}: {a} -> {b}")
+    if regressions:
+        sys.exit(1)
+    print("no regressions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every LendIT route.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('--iterations', type=int, default=30, help="sequential requests per route")
+        p.add_argument('--concurrency', type=int, default=8, help="load generator threads")
+        p.add_argument('--requests-per-thread', type=int, default=10)
+        p.add_argument('--workers', type=int, default=1, help="seeder worker processes")
+        p.add_argument('--cache', action='store_true', help="let the result cache serve repeat requests")
+        p.add_argument('--reseed', action='store_true', help="drop and reseed the benchmark database")
+
+    run = sub.add_parser('run', help="benchmark and write a JSON report")
+    run.add_argument('--scales', default='small')
+    run.add_argument('--out', default=os.path.join('.bench', 'current.json'))
+    run.add_argument('--workdir', default='.bench', help="where the SQLite databases are kept")
+    run.add_argument('--db-url', help="benchmark this database (e.g. a local MySQL) instead of SQLite")
+    common(run)
+    run.set_defaults(func=cmd_run)
+
+    one = sub.add_parser('_scale')  # internal: one scale in a fresh process
+    one.add_argument('scale')
+    one.add_argument('db_url')
+    one.add_argument('out')
+    common(one)
+    one.set_defaults(func=cmd_scale)
+
+    startup = sub.add_parser('_startup')  # internal: cold start in a fresh process
+    startup.add_argument('db_url')
+    startup.add_argument('out')
+    startup.set_defaults(func=cmd_startup)
+
+    cmp_ = sub.add_parser('compare', help="flag regressions between two reports")
+    cmp_.add_argument('baseline')
+    cmp_.add_argument('current')
+    cmp_.add_argument('--threshold', type=float, default=0.2, help="allowed relative slowdown")
+    cmp_.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Versioned result cache for the dashboard queries.
+
+Every cached entry is tagged with the tables it reads. Each table has a version
+counter, and the counters of an entry's tables are part of its key, so bumping
+the counter of one table (after a committed write) makes every entry that reads
+it unreachable while entries over other tables keep hitting. Unreachable
+entries are never deleted explicitly; they age out of the LRU (or expire in
+the shared backend).
+
+Two backends are provided:
+    LRUBackend   - bounded, in-process; versions are local to the process, so
+                   writes made by other processes (workers, CLI commands) only
+                   show once a version ages out after `ttl` seconds.
+    RedisBackend - shared by every worker; needs the optional `redis` package.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class LRUBackend:
+    """
+    Bounded in-process LRU store plus table version counters. A version not
+    bumped for `ttl` seconds is bumped on its next read, since another process
+    may have written the table meanwhile; ttl=0 keeps versions until this
+    process writes, which is right only when it is the database's sole writer.
+    """
+
+    def __init__(self, maxsize=1024, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._versions = {}     # table -> (version, time it was set)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        # versions restart at zero with the process; the epoch tells the runs apart
+        self.epoch = uuid.uuid4().hex[:12]
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_versions(self, tables):
+        now = time.monotonic()
+        versions = []
+        with self._lock:
+            for t in tables:
+                version, since = self._versions.get(t, (0, now))
+                if self.ttl and now - since >= self.ttl:
+                    version, since = version + 1, now
+                self._versions[t] = (version, since)
+                versions.append(version)
+        return versions
+
+    def bump(self, tables):
+        now = time.monotonic()
+        with self._lock:
+            for t in tables:
+                self._versions[t] = (self._versions.get(t, (0, now))[0] + 1, now)
+
+    def written_within(self, tables, seconds):
+        """Whether any of `tables` got a new version in the last `seconds`."""
+        now = time.monotonic()
+        with self._lock:
+            return any(now - self._versions[t][1] < seconds for t in tables if t in self._versions)
+
+    def stats(self):
+        return {'backend': 'lru', 'size': len(self._data), 'maxsize': self.maxsize,
+                'evictions': self.evictions, 'ttl': self.ttl}
+
+
+class RedisBackend:
+    """
+    Shared store so every worker sees the same entries and version counters.
+    Entries expire after `ttl` seconds; eviction under memory pressure is left
+    to the Redis maxmemory policy.
+    """
+
+    def __init__(self, url, prefix='lendit:cache:', ttl=3600):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self._epoch = None
+
+    @property
+    def epoch(self):
+        """Identifies this generation of the shared version counters (renewed if Redis loses them)."""
+        if self._epoch is None:
+            self.client.set(self.prefix + 'epoch', uuid.uuid4().hex[:12], nx=True)
+            self._epoch = self.client.get(self.prefix + 'epoch').decode()
+        return self._epoch
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + 'e:' + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + 'e:' + key, pickle.dumps(value), ex=self.ttl)
+
+    def get_versions(self, tables):
+        values = self.client.mget([self.prefix + 'v:' + t for t in tables])
+        return [int(v) if v is not None else 0 for v in values]
+
+    def bump(self, tables):
+        pipe = self.client.pipeline()
+        for t in tables:
+            pipe.incr(self.prefix + 'v:' + t)
+            pipe.set(self.prefix + 'w:' + t, time.time())
+        pipe.execute()
+
+    def written_within(self, tables, seconds):
+        now = time.time()
+        values = self.client.mget([self.prefix + 'w:' + t for t in tables])
+        return any(now - float(v) < seconds for v in values if v is not None)
+
+    def stats(self):
+        return {'backend': 'redis', 'ttl': self.ttl}
+
+
+class ResultCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def version_tag(self, tables):
+        """A string that changes whenever any of `tables` is written, e.g. for ETags."""
+        versions = self.backend.get_versions(tables)
+        return self.backend.epoch + ':' + ','.join(f"{t}:{v}" for t, v in zip(tables, versions))
+
+    def get_or_compute(self, key, tables, compute, tag=None):
+        """Return the cached value for `key` at the current `tables` versions,
+        calling `compute()` and storing its result on a miss. `tag` is a
+        version_tag(tables) the caller already holds."""
+        full_key = key + '|' + (tag or self.version_tag(tables))
+        value = self.backend.get(full_key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self.backend.set(full_key, value)
+        return value
+
+    def written_within(self, tables, seconds):
+        """Whether any of `tables` was written in the last `seconds`, by any
+        process the backend hears from."""
+        return seconds > 0 and self.backend.written_within(tables, seconds)
+
+    def invalidate(self, tables):
+        """Bump the version of each table in `tables`."""
+        if tables:
+            self.backend.bump(sorted(tables))
+
+    def stats(self):
+        stats = {'hits': self.hits, 'misses': self.misses}
+        stats.update(self.backend.stats())
+        return stats
@@ -0,0 +1,147 @@
+"""
+Cleaning schedule: which products are due for maintenance, and when.
+
+CleaningSchedule keeps every scheduled product in a binary min-heap keyed by
+(next_cleaning_due, product_id), so the next product due is read off the top
+in O(1). Rescheduling or removing a product doesn't search the heap: the new
+entry is pushed (O(log n)) and the old one is left behind as stale, recognised
+by its sequence number and skipped when it surfaces. The heap is rebuilt once
+stale entries outnumber live ones.
+
+"Due before day X" walks the heap from the root and never descends below an
+entry due on or after X, since everything under it is due later still. The
+first k entries in due order (the overdue view) come from a best-first walk
+in O(k log k); a window [since, X) visits every entry before X, so it costs
+O(m) for the m entries due before X. Neither passes over every product.
+
+Products being cleaned leave the heap and sit in `cleaning` until their
+cleaning is completed and they are rescheduled.
+"""
+import heapq
+import threading
+import time
+from datetime import date
+
+
+class CleaningSchedule:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._heap = []         # [due ordinal, product_id, seq]; stale when seq is outdated
+        self.due = {}           # product_id -> (due ordinal, seq), scheduled products
+        self.cleaning = {}      # product_id -> None, being cleaned, in the order cleaning started
+        self._seq = 0
+        self.loaded = False
+        self.loaded_at = None
+
+    def load(self, rows):
+        """Replace the schedule; `rows` yields (product_id, next_cleaning_due, status)."""
+        due, cleaning = {}, {}
+        seq = 0
+        for product_id, next_due, status in rows:
+            if status == 'cleaning':
+                cleaning[product_id] = None
+            elif next_due is not None:
+                seq += 1
+                due[product_id] = (next_due.toordinal(), seq)
+        heap = [[day, product_id, s] for product_id, (day, s) in due.items()]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap, self.due, self.cleaning, self._seq = heap, due, cleaning, seq
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def _prune(self):
+        """Drop stale entries from the top so peek stays O(1); compact when mostly stale."""
+        heap, due = self._heap, self.due
+        while heap and due.get(heap[0][1], (None, None))[1] != heap[0][2]:
+            heapq.heappop(heap)
+        if len(heap) > 2 * len(due) + 64:
+            self._heap = [[day, pid, s] for pid, (day, s) in due.items()]
+            heapq.heapify(self._heap)
+
+    def put(self, product_id, next_due, status):
+        """Record a product's current Maintenance state."""
+        with self._lock:
+            self.due.pop(product_id, None)
+            self.cleaning.pop(product_id, None)
+            if status == 'cleaning':
+                self.cleaning[product_id] = None
+            elif next_due is not None:
+                self._seq += 1
+                day = next_due.toordinal()
+                self.due[product_id] = (day, self._seq)
+                heapq.heappush(self._heap, [day, product_id, self._seq])
+            self._prune()
+
+    def drop(self, product_id):
+        with self._lock:
+            self.due.pop(product_id, None)
+            self.cleaning.pop(product_id, None)
+            self._prune()
+
+    def peek(self):
+        """(product_id, due date) of the next product due, or None."""
+        with self._lock:
+            if not self._heap:
+                return None
+            day, product_id, _ = self._heap[0]
+            return product_id, date.fromordinal(day)
+
+    def due_before(self, day, since=None, limit=None):
+        """
+        [(product_id, due date)] for scheduled products due before `day` (and
+        on or after `since`, if given), earliest first.
+        """
+        bound = day.toordinal()
+        with self._lock:
+            if since is None:
+                found = self._first_before(bound, limit)
+            else:
+                lower = since.toordinal()
+                found = [entry for entry in self._all_before(bound) if entry[0] >= lower]
+                found = sorted(found) if limit is None else heapq.nsmallest(limit, found)
+        return [(product_id, date.fromordinal(d)) for d, product_id in found]
+
+    def _live(self, entry):
+        return self.due.get(entry[1], (None, None))[1] == entry[2]
+
+    def _first_before(self, bound, limit):
+        """Live (day, product_id) entries before `bound` in order, at most `limit`."""
+        heap = self._heap
+        found = []
+        # best-first walk with a frontier heap of the positions reachable next
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and (limit is None or len(found) < limit):
+            entry, i = heapq.heappop(frontier)
+            if entry[0] >= bound:
+                break
+            if self._live(entry):
+                found.append((entry[0], entry[1]))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def _all_before(self, bound):
+        """Every live (day, product_id) entry before `bound`, unordered."""
+        heap = self._heap
+        found = []
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            entry = heap[i]
+            if entry[0] >= bound:
+                continue    # so is everything below it
+            if self._live(entry):
+                found.append((entry[0], entry[1]))
+            stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+        return found
+
+    def being_cleaned(self):
+        with self._lock:
+            return list(self.cleaning)
+
+    def counts(self, today):
+        with self._lock:
+            return {'scheduled': len(self.due), 'cleaning': len(self.cleaning),
+                    'overdue': len(self._all_before(today.toordinal()))}
@@ -62,6 +62,136 @@ CREATE TABLE Maintenance (
     product_id INT,
     last_cleaned DATE NOT NULL,
     next_cleaning_due DATE,
-    status ENUM('pending', 'completed') NOT NULL,
+    status ENUM('pending', 'completed', 'cleaning') NOT NULL,
     FOREIGN KEY (product_id) REFERENCES Products(product_id) ON DELETE CASCADE
 );
+
+-- Derived per-product aggregates maintained by the application
+-- (rebuild with `flask rebuild-stats`).
+CREATE TABLE ProductStats (
+    product_id INT PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_avg FLOAT,
+    rental_count INT NOT NULL DEFAULT 0,
+    revenue_sum DECIMAL(12,2) NOT NULL DEFAULT 0,
+    rental_days INT NOT NULL DEFAULT 0,
+    INDEX ix_ProductStats_rating_avg (rating_avg),
+    INDEX ix_ProductStats_rental_count (rental_count),
+    INDEX ix_ProductStats_revenue_sum (revenue_sum),
+    FOREIGN KEY (product_id) REFERENCES Products(product_id) ON DELETE CASCADE
+);
+
+-- Archived history (`flask archive`): the same columns and keys as the hot
+-- tables, without foreign keys.
+CREATE TABLE RentalsArchive (
+    rental_id INT PRIMARY KEY,
+    renter_id INT,
+    product_id INT,
+    rental_start DATE NOT NULL,
+    rental_end DATE NOT NULL,
+    total_cost DECIMAL(10,2) NOT NULL,
+    status ENUM('ongoing', 'completed', 'canceled') NOT NULL,
+    INDEX ix_RentalsArchive_product_id_rental_start (product_id, rental_start),
+    INDEX ix_RentalsArchive_renter_id_total_cost (renter_id, total_cost)
+);
+
+CREATE TABLE PaymentsArchive (
+    payment_id INT PRIMARY KEY,
+    rental_id INT,
+    user_id INT,
+    amount DECIMAL(10,2) NOT NULL,
+    payment_status ENUM('pending', 'completed', 'failed') NOT NULL,
+    payment_date DATETIME,
+    INDEX ix_PaymentsArchive_rental_id (rental_id)
+);
+
+CREATE TABLE ReviewsArchive (
+    review_id INT PRIMARY KEY,
+    user_id INT,
+    product_id INT,
+    rating INT NOT NULL,
+    comment TEXT,
+    review_date DATETIME,
+    INDEX ix_ReviewsArchive_product_id_rating (product_id, rating)
+);
+
+-- Top-k "renters also rented" neighbours of each product, maintained by the
+-- application (rebuild with `flask rebuild-related`).
+CREATE TABLE RelatedProducts (
+    product_id INT,
+    related_id INT,
+    renters INT NOT NULL,
+    PRIMARY KEY (product_id, related_id),
+    INDEX ix_RelatedProducts_related_id (related_id),
+    FOREIGN KEY (product_id) REFERENCES Products(product_id) ON DELETE CASCADE,
+    FOREIGN KEY (related_id) REFERENCES Products(product_id) ON DELETE CASCADE
+);
+
+-- Per-user owner revenue, listings, renter spend and rental count per day
+-- (or per month once compacted), and all-time totals, maintained by the
+-- application (rebuild with `flask rebuild-rollups`).
+CREATE TABLE UserRollups (
+    user_id INT,
+    bucket DATE,
+    period ENUM('day', 'month'),
+    owner_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    items_listed INT NOT NULL DEFAULT 0,
+    renter_spend DECIMAL(12,2) NOT NULL DEFAULT 0,
+    rental_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, bucket, period)
+);
+
+CREATE TABLE UserTotals (
+    user_id INT PRIMARY KEY,
+    owner_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    items_listed INT NOT NULL DEFAULT 0,
+    renter_spend DECIMAL(12,2) NOT NULL DEFAULT 0,
+    rental_count INT NOT NULL DEFAULT 0,
+    INDEX ix_UserTotals_items_listed (items_listed),
+    INDEX ix_UserTotals_rental_count_items_listed (rental_count, items_listed)
+);
+
+-- Background sweep checkpoints and run history (`flask sweep`).
+CREATE TABLE JobCheckpoints (
+    job VARCHAR(64) PRIMARY KEY,
+    last_key BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME
+);
+
+CREATE TABLE JobRuns (
+    run_id INT PRIMARY KEY AUTO_INCREMENT,
+    job VARCHAR(64) NOT NULL,
+    started_at DATETIME NOT NULL,
+    seconds FLOAT NOT NULL,
+    start_key BIGINT NOT NULL,
+    end_key BIGINT NOT NULL,
+    finished BOOLEAN NOT NULL,
+    chunks INT NOT NULL,
+    scanned INT NOT NULL,
+    updated INT NOT NULL,
+    counts TEXT,
+    rows_per_second FLOAT,
+    lag_seconds FLOAT,
+    INDEX ix_JobRuns_job_started_at (job, started_at)
+);
+
+-- Secondary indexes for the analytics routes (checked by `flask check-plans`).
+CREATE INDEX ix_Users_role ON Users (role);
+CREATE INDEX ix_Products_category_sub_category_rental_price ON Products (category, sub_category, rental_price);
+CREATE INDEX ix_Rentals_product_id_rental_start ON Rentals (product_id, rental_start);
+CREATE INDEX ix_Rentals_renter_id_total_cost ON Rentals (renter_id, total_cost);
+CREATE INDEX ix_Payments_rental_id_payment_status ON Payments (rental_id, payment_status);
+CREATE INDEX ix_Reviews_product_id_rating ON Reviews (product_id, rating);
+CREATE INDEX ix_Maintenance_last_cleaned ON Maintenance (last_cleaned);
+CREATE INDEX ix_Maintenance_product_id ON Maintenance (product_id);
+
+-- One full-text document per product: name, sub_category and review comments
+-- (rebuild with `flask rebuild-search`).
+CREATE TABLE ProductSearch (
+    product_id INT PRIMARY KEY,
+    name VARCHAR(255),
+    sub_category VARCHAR(255),
+    comments MEDIUMTEXT,
+    FULLTEXT INDEX ft_ProductSearch (name, sub_category, comments)
+);
@@ -610,3 +610,52 @@ INSERT INTO Maintenance (product_id, last_cleaned, next_cleaning_due, status) VA
 (24, '2025-02-13', '2025-03-15', 'completed'),
 (89, '2025-02-01', '2025-03-03', 'completed'),
 (21, '2025-02-16', '2025-03-18', 'pending');
+
+INSERT INTO ProductStats (product_id, review_count, rating_sum, rating_avg, rental_count, revenue_sum, rental_days)
+SELECT p.product_id,
+       COALESCE(rv.review_count, 0),
+       COALESCE(rv.rating_sum, 0),
+       rv.rating_sum / rv.review_count,
+       COALESCE(r.rental_count, 0),
+       COALESCE(r.revenue_sum, 0),
+       COALESCE(r.rental_days, 0)
+FROM Products p
+LEFT JOIN (SELECT product_id, COUNT(*) AS rental_count, SUM(total_cost) AS revenue_sum,
+                  SUM(DATEDIFF(rental_end, rental_start)) AS rental_days
+           FROM Rentals GROUP BY product_id) r ON r.product_id = p.product_id
+LEFT JOIN (SELECT product_id, COUNT(*) AS review_count, SUM(rating) AS rating_sum
+           FROM Reviews GROUP BY product_id) rv ON rv.product_id = p.product_id;
+
+-- UserRollups and UserTotals, as `flask rebuild-rollups` computes them:
+-- renter spend and owner revenue on each rental's start day, current listings
+-- on today, and days before the 90-day cutoff folded into their month.
+SET @rollup_cutoff = DATE_FORMAT(CURDATE() - INTERVAL 90 DAY, '%Y-%m-01');
+
+INSERT INTO UserRollups (user_id, bucket, period, owner_revenue, items_listed, renter_spend, rental_count)
+SELECT user_id,
+       CASE WHEN day < @rollup_cutoff THEN DATE_FORMAT(day, '%Y-%m-01') ELSE day END,
+       CASE WHEN day < @rollup_cutoff THEN 'month' ELSE 'day' END,
+       SUM(owner_revenue), SUM(items_listed), SUM(renter_spend), SUM(rental_count)
+FROM (SELECT h.renter_id AS user_id, h.rental_start AS day, 0 AS owner_revenue, 0 AS items_listed,
+             h.total_cost AS renter_spend, 1 AS rental_count
+      FROM (SELECT renter_id, product_id, rental_start, total_cost FROM Rentals
+            UNION ALL
+            SELECT renter_id, product_id, rental_start, total_cost FROM RentalsArchive) h
+      WHERE h.renter_id IS NOT NULL
+      UNION ALL
+      SELECT p.owner_id, h.rental_start, h.total_cost, 0, 0, 0
+      FROM (SELECT product_id, rental_start, total_cost FROM Rentals
+            UNION ALL
+            SELECT product_id, rental_start, total_cost FROM RentalsArchive) h
+      JOIN Products p ON p.product_id = h.product_id
+      WHERE p.owner_id IS NOT NULL
+      UNION ALL
+      SELECT owner_id, CURDATE(), 0, 1, 0, 0
+      FROM Products
+      WHERE owner_id IS NOT NULL) activity
+GROUP BY 1, 2, 3;
+
+INSERT INTO UserTotals (user_id, owner_revenue, items_listed, renter_spend, rental_count)
+SELECT user_id, SUM(owner_revenue), SUM(items_listed), SUM(renter_spend), SUM(rental_count)
+FROM UserRollups
+GROUP BY user_id;
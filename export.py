@@ -0,0 +1,80 @@
+"""
+Streaming CSV / NDJSON export of query results.
+
+Rows are pulled from the database in partitions with `yield_per` (a server-side
+cursor on MySQL) and each partition is serialised and handed to the client
+before the next one is fetched, so memory stays flat however many rows the
+query returns.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_PARTITION_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def json_row(keys, row):
+    """One result row as a JSON-ready dict (decimals as strings, dates in ISO format)."""
+    return {key: value if value is None or isinstance(value, (bool, int, float, str)) else _json_default(value)
+            for key, value in zip(keys, row)}
+
+
+def _csv_chunks(result, partitions):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(result.keys())
+    for partition in partitions:
+        writer.writerows(partition)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _ndjson_chunks(result, partitions):
+    keys = list(result.keys())
+    for partition in partitions:
+        yield ''.join(
+            json.dumps(dict(zip(keys, row)), default=_json_default) + '\n'
+            for row in partition
+        )
+
+
+def _counted(partitions, on_rows):
+    for partition in partitions:
+        on_rows(len(partition))
+        yield partition
+
+
+def stream_rows(session, stmt, fmt, partition_size=DEFAULT_PARTITION_SIZE, on_rows=None):
+    """
+    Execute `stmt` and yield it serialised as `fmt` ('csv' or 'ndjson').
+    `on_rows` is called with the size of each partition fetched.
+    """
+    result = session.execute(stmt, execution_options={'yield_per': partition_size})
+    try:
+        partitions = result.partitions()
+        if on_rows:
+            partitions = _counted(partitions, on_rows)
+        chunks = _csv_chunks(result, partitions) if fmt == 'csv' else _ndjson_chunks(result, partitions)
+        for chunk in chunks:
+            yield chunk
+    finally:
+        result.close()
@@ -0,0 +1,272 @@
+"""
+In-memory bitmap index over the product catalog for faceted search.
+
+Every product gets a dense position; a bitmap is a Python int with bit `pos`
+set for each matching product. Equality filters (category, sub_category,
+in-stock, price facet bucket) keep one bitmap per value, so a search is a
+handful of big-int ANDs and every facet count is one AND plus `bit_count()`,
+independent of how many rows a GROUP BY would have had to touch.
+
+Range filters (price, average rating) use RangeBitmaps: fixed-width buckets,
+each with a bitmap for the whole bucket plus a value-sorted list used only to
+trim the two partially covered edge buckets.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+
+# Display buckets for the price facet: (label, low inclusive, high exclusive)
+PRICE_FACETS = [
+    ('under 250', 0, 250),
+    ('250-500', 250, 500),
+    ('500-1000', 500, 1000),
+    ('1000-1500', 1000, 1500),
+    ('1500-2000', 1500, 2000),
+    ('2000+', 2000, None),
+]
+
+
+def price_facet(price):
+    for label, lo, hi in PRICE_FACETS:
+        if hi is None or price < hi:
+            return label
+    return PRICE_FACETS[-1][0]
+
+
+def bitmap_from_positions(positions):
+    if not positions:
+        return 0
+    buf = bytearray((max(positions) >> 3) + 1)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def iter_positions(bitmap, limit=None):
+    """Set bit positions of `bitmap` in ascending order, at most `limit` of them."""
+    # Work on a small window at the low end so each step does not copy the
+    # whole (possibly megabit) bitmap.
+    window = 4096
+    mask = (1 << window) - 1
+    count = 0
+    base = 0
+    while bitmap:
+        skip = (bitmap & -bitmap).bit_length() - 1
+        bitmap >>= skip
+        base += skip
+        chunk = bitmap & mask
+        while chunk:
+            if limit is not None and count >= limit:
+                return
+            low = chunk & -chunk
+            yield base + low.bit_length() - 1
+            chunk ^= low
+            count += 1
+        bitmap >>= window
+        base += window
+
+
+class RangeBitmaps:
+    def __init__(self, width):
+        self.width = width
+        self.buckets = {}   # bucket number -> [bitmap, sorted [(value, pos)]]
+
+    def load(self, values):
+        """Replace the contents with (value, pos) pairs in one pass."""
+        grouped = {}
+        for value, pos in values:
+            grouped.setdefault(int(value // self.width), []).append((value, pos))
+        self.buckets = {}
+        for number, pairs in grouped.items():
+            pairs.sort()
+            self.buckets[number] = [bitmap_from_positions([pos for _, pos in pairs]), pairs]
+
+    def add(self, pos, value):
+        bucket = self.buckets.setdefault(int(value // self.width), [0, []])
+        bucket[0] |= 1 << pos
+        insort(bucket[1], (value, pos))
+
+    def remove(self, pos, value):
+        bucket = self.buckets.get(int(value // self.width))
+        if bucket is None:
+            return
+        bucket[0] &= ~(1 << pos)
+        i = bisect_left(bucket[1], (value, pos))
+        if i < len(bucket[1]) and bucket[1][i] == (value, pos):
+            del bucket[1][i]
+
+    def query(self, lo=None, hi=None):
+        """Bitmap of positions with lo <= value <= hi (either bound optional)."""
+        result = 0
+        lo_bucket = int(lo // self.width) if lo is not None else None
+        hi_bucket = int(hi // self.width) if hi is not None else None
+        for number, (bitmap, values) in self.buckets.items():
+            if (lo_bucket is not None and number < lo_bucket) or (hi_bucket is not None and number > hi_bucket):
+                continue
+            if number == lo_bucket or number == hi_bucket:
+                start = bisect_left(values, (lo, -1)) if lo is not None else 0
+                end = bisect_right(values, (hi, float('inf'))) if hi is not None else len(values)
+                result |= bitmap_from_positions([pos for _, pos in values[start:end]])
+            else:
+                result |= bitmap
+        return result
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded = False
+        self.loaded_at = None
+
+    def _reset(self):
+        self.positions = {}     # product_id -> position
+        self.ids = []           # position -> product_id; ascending, so positions follow id order
+        self.rows = []          # position -> [product_id, name, category, sub_category, price, qty, reviews, rating_sum]
+        self.alive = 0
+        self.equal = {}         # (field, value) -> bitmap
+        self.prices = RangeBitmaps(10)
+        self.ratings = RangeBitmaps(0.1)
+
+    def _set_bit(self, key, pos, on):
+        if on:
+            self.equal[key] = self.equal.get(key, 0) | (1 << pos)
+        elif key in self.equal:
+            self.equal[key] &= ~(1 << pos)
+
+    @staticmethod
+    def _keys(row):
+        product_id, name, category, sub_category, price, qty, reviews, rating_sum = row
+        return (('category', category), ('sub_category', sub_category),
+                ('price', price_facet(price)), ('in_stock', qty > 0))
+
+    def _index_row(self, pos, on):
+        row = self.rows[pos]
+        for key in self._keys(row):
+            self._set_bit(key, pos, on)
+        price, reviews, rating_sum = row[4], row[6], row[7]
+        (self.prices.add if on else self.prices.remove)(pos, price)
+        if reviews:
+            (self.ratings.add if on else self.ratings.remove)(pos, rating_sum / reviews)
+
+    def load(self, products):
+        """
+        Replace the index contents. `products` yields (product_id, name,
+        category, sub_category, rental_price, available_quantity, review_count,
+        rating_sum), preferably in product_id order.
+        """
+        # Collect positions per key first: setting bits one at a time would
+        # copy a growing big int for every product.
+        by_key, prices, ratings = {}, [], []
+        with self._lock:
+            self._reset()
+            for pos, (product_id, name, category, sub_category, price, qty, reviews, rating_sum) in enumerate(products):
+                row = [product_id, name, category, sub_category, float(price), int(qty), reviews, rating_sum]
+                self.positions[product_id] = pos
+                self.ids.append(product_id)
+                self.rows.append(row)
+                for key in self._keys(row):
+                    by_key.setdefault(key, []).append(pos)
+                prices.append((row[4], pos))
+                if reviews:
+                    ratings.append((rating_sum / reviews, pos))
+            self.equal = {key: bitmap_from_positions(positions) for key, positions in by_key.items()}
+            self.alive = (1 << len(self.rows)) - 1
+            self.prices.load(prices)
+            self.ratings.load(ratings)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def _put(self, product_id, name, category, sub_category, price, qty, reviews=0, rating_sum=0):
+        pos = self.positions.get(product_id)
+        if pos is None:
+            pos = self.positions[product_id] = len(self.rows)
+            self.rows.append(None)
+            self.ids.append(product_id)
+            self.alive |= 1 << pos
+        else:
+            reviews, rating_sum = self.rows[pos][6], self.rows[pos][7]
+            self._index_row(pos, False)
+        self.rows[pos] = [product_id, name, category, sub_category, float(price), int(qty), reviews, rating_sum]
+        self._index_row(pos, True)
+
+    def put_product(self, product_id, name, category, sub_category, price, qty):
+        """Add a product or re-index one whose attributes changed (keeps its rating)."""
+        with self._lock:
+            self._put(product_id, name, category, sub_category, price, qty)
+
+    def drop_product(self, product_id):
+        with self._lock:
+            pos = self.positions.pop(product_id, None)
+            if pos is not None:
+                self._index_row(pos, False)
+                self.alive &= ~(1 << pos)
+
+    def add_reviews(self, product_id, count, rating_sum):
+        """Apply a review count / rating sum delta to a product's average."""
+        with self._lock:
+            pos = self.positions.get(product_id)
+            if pos is None:
+                return
+            row = self.rows[pos]
+            if row[6]:
+                self.ratings.remove(pos, row[7] / row[6])
+            row[6] += count
+            row[7] += rating_sum
+            if row[6]:
+                self.ratings.add(pos, row[7] / row[6])
+
+    def search(self, category=None, sub_category=None, min_price=None, max_price=None,
+               min_rating=None, in_stock=False, after=None, limit=50):
+        """
+        Returns (rows, total, facets, next_after). rows are (product_id, name,
+        category, sub_category, rental_price, available_quantity, avg_rating)
+        in product_id order; `after` / next_after are product_id cursors.
+        Facet counts for each dimension apply every filter except that
+        dimension's own, so the other choices stay visible.
+        """
+        with self._lock:
+            filters = {}
+            if category:
+                filters['category'] = self.equal.get(('category', category), 0)
+            if sub_category:
+                filters['sub_category'] = self.equal.get(('sub_category', sub_category), 0)
+            if min_price is not None or max_price is not None:
+                filters['price'] = self.prices.query(min_price, max_price)
+            if min_rating is not None:
+                filters['rating'] = self.ratings.query(min_rating, None)
+            if in_stock:
+                filters['in_stock'] = self.equal.get(('in_stock', True), 0)
+
+            def matching(skip=None):
+                bitmap = self.alive
+                for name, f in filters.items():
+                    if name != skip:
+                        bitmap &= f
+                return bitmap
+
+            result = matching()
+            facets = {}
+            for field in ('category', 'sub_category', 'price'):
+                base = matching(skip=field)
+                counts = {}
+                for (f, value), bitmap in self.equal.items():
+                    if f == field:
+                        n = (base & bitmap).bit_count()
+                        if n:
+                            counts[value] = n
+                facets[field] = counts
+
+            page = result
+            if after is not None:
+                first = bisect_right(self.ids, after)
+                page = (page >> first) << first
+            positions = list(iter_positions(page, limit + 1))
+            next_after = self.ids[positions[limit - 1]] if len(positions) > limit else None
+            rows = []
+            for pos in positions[:limit]:
+                product_id, name, cat, sub, price, qty, reviews, rating_sum = self.rows[pos]
+                rows.append((product_id, name, cat, sub, price, qty,
+                             round(rating_sum / reviews, 2) if reviews else None))
+            return rows, result.bit_count(), facets, next_after
@@ -0,0 +1,128 @@
+"""
+Ranked keyword search over product name, sub_category and review comments.
+
+Each product has one document row in ProductSearch holding its name,
+sub_category and the concatenated comments of its reviews, archived ones
+included. On SQLite the table
+is an FTS5 virtual table (rowid = product_id, ranked with bm25); on MySQL it is
+an InnoDB table with a FULLTEXT index, queried in boolean mode. `search` hides
+the difference. Documents are rewritten inside the writing transaction by
+`refresh_documents`, so the index is never behind the tables it mirrors.
+"""
+import re
+
+from sqlalchemy import bindparam, text
+
+
+SEARCH_TABLE = 'ProductSearch'
+
+# bm25 column weights (SQLite): a hit in the name beats one in sub_category,
+# which beats one buried in review comments
+_BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_CHUNK = 1000
+
+
+def _is_sqlite(conn):
+    return conn.dialect.name == 'sqlite'
+
+
+def _key(conn):
+    return 'rowid' if _is_sqlite(conn) else 'product_id'
+
+
+def create_search_table(conn):
+    if _is_sqlite(conn):
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            "USING fts5(name, sub_category, comments, prefix='2 3')")
+    else:
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "product_id INT PRIMARY KEY, name VARCHAR(255), sub_category VARCHAR(255), "
+            "comments MEDIUMTEXT, FULLTEXT INDEX ft_ProductSearch (name, sub_category, comments))")
+
+
+def drop_search_table(conn):
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def _documents(conn, product_ids):
+    products = conn.execute(
+        text("SELECT product_id, name, sub_category FROM Products WHERE product_id IN :ids")
+        .bindparams(bindparam('ids', expanding=True)), {'ids': product_ids}).all()
+    comments = {}
+    rows = conn.execute(
+        text("SELECT product_id, comment FROM Reviews WHERE product_id IN :ids AND comment IS NOT NULL "
+             "UNION ALL SELECT product_id, comment FROM ReviewsArchive "
+             "WHERE product_id IN :ids AND comment IS NOT NULL")
+        .bindparams(bindparam('ids', expanding=True)), {'ids': product_ids})
+    for product_id, comment in rows:
+        comments.setdefault(product_id, []).append(comment)
+    return [{'id': product_id, 'name': name, 'sub_category': sub_category,
+             'comments': ' '.join(comments.get(product_id, ()))}
+            for product_id, name, sub_category in products]
+
+
+def refresh_documents(conn, product_ids):
+    """Rewrite the documents of `product_ids` (dropping those of deleted products)."""
+    product_ids = sorted(set(product_ids))
+    key = _key(conn)
+    for i in range(0, len(product_ids), _CHUNK):
+        chunk = product_ids[i:i + _CHUNK]
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN :ids")
+                     .bindparams(bindparam('ids', expanding=True)), {'ids': chunk})
+        docs = _documents(conn, chunk)
+        if docs:
+            conn.execute(text(f"INSERT INTO {SEARCH_TABLE} ({key}, name, sub_category, comments) "
+                              "VALUES (:id, :name, :sub_category, :comments)"), docs)
+
+
+def rebuild(conn, chunk_size=10000):
+    """Recreate every document, walking Products in primary key chunks."""
+    drop_search_table(conn)
+    create_search_table(conn)
+    last = 0
+    total = 0
+    while True:
+        ids = conn.execute(text("SELECT product_id FROM Products WHERE product_id > :last "
+                                "ORDER BY product_id LIMIT :n"), {'last': last, 'n': chunk_size}).scalars().all()
+        if not ids:
+            return total
+        refresh_documents(conn, ids)
+        total += len(ids)
+        last = ids[-1]
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search(conn, query, prefix=True, limit=20):
+    """
+    [(product_id, score)] best match first. Every term must match; with
+    `prefix` the last term also matches as a prefix, for type-ahead.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    if _is_sqlite(conn):
+        phrases = [f'"{t}"' for t in terms]
+        if prefix:
+            phrases[-1] += '*'
+        weights = ', '.join(str(w) for w in _BM25_WEIGHTS)
+        # bm25 is lower-is-better; negate so callers always sort descending
+        rows = conn.execute(text(
+            f"SELECT rowid, -bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :q ORDER BY score DESC LIMIT :n"),
+            {'q': ' AND '.join(phrases), 'n': limit})
+    else:
+        words = ['+' + t for t in terms]
+        if prefix:
+            words[-1] += '*'
+        rows = conn.execute(text(
+            "SELECT product_id, MATCH(name, sub_category, comments) AGAINST (:q IN BOOLEAN MODE) AS score "
+            f"FROM {SEARCH_TABLE} WHERE MATCH(name, sub_category, comments) AGAINST (:q IN BOOLEAN MODE) "
+            "ORDER BY score DESC LIMIT :n"),
+            {'q': ' '.join(words), 'n': limit})
+    return [(product_id, score) for product_id, score in rows]
@@ -0,0 +1,216 @@
+"""
+Per-request SQL and rendering instrumentation.
+
+A RequestStats collects, for the request running on the current thread (or
+task), the number of SQL statements, the time spent in the database, the time
+spent rendering templates and the result rows the response returns, whether
+to a template, as JSON or as an export (`rows_returned`). Engine events feed
+it via `instrument_engine`; the web layer starts it with each request, turns
+it into a Server-Timing header and records it in a RouteMetrics registry of
+per-route histograms. A streamed body runs after the view has returned, so
+it is iterated through `streamed` and recorded once it has been sent.
+
+With an N+1 threshold set, a statement shape (the SQL text with literal lists
+collapsed) that runs more than that many times in one request is reported,
+which is how per-row lazy loads and per-object INSERT loops show up.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+
+# Upper bounds of the histogram buckets, per metric; the last bucket is +inf
+BUCKETS = {
+    'duration_ms': (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+    'db_ms': (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'render_ms': (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250),
+    'statements': (0, 1, 2, 3, 5, 10, 20, 50, 100, 1000),
+    'rows': (0, 1, 10, 50, 100, 500, 1000, 10000),
+}
+
+_current = ContextVar('request_stats', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+# "IN (?, ?, ?)" / "VALUES (?, ?), (?, ?)" -> one placeholder group
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)')
+_REPEATED_GROUPS = re.compile(r'(\(\?\))(?:\s*,\s*\(\?\))+')
+
+
+def statement_shape(statement):
+    shape = _WHITESPACE.sub(' ', statement.strip())
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _REPEATED_GROUPS.sub(r'\1', shape)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.rows = 0
+        self.render_started = None
+        self.shapes = {}
+        # statements may come from worker threads fanning out for the request
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated(self, threshold):
+        """[(shape, count)] for statement shapes run more than `threshold` times."""
+        return sorted(((shape, n) for shape, n in self.shapes.items() if n > threshold),
+                      key=lambda item: -item[1])
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statements} statements"',
+            f'render;dur={self.render_seconds * 1000:.2f};desc="{self.rows} rows"',
+            f'total;dur={self.elapsed() * 1000:.2f}',
+        ])
+
+
+def start_request():
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def finish_request():
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def attached(stats):
+    """Count this thread's statements against `stats`, e.g. in a worker doing part of a request."""
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def streamed(stats, chunks):
+    """Iterate the response body `chunks`, counting its statements and rows against `stats`."""
+    with attached(stats):
+        yield from chunks
+
+
+def instrument_engine(engine):
+    """Count statements and time them against the current request, if any."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        started = conn.info.get('query_started')
+        if stats is None or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        shape = statement_shape(statement)
+        with stats._lock:
+            stats.db_seconds += elapsed
+            stats.statements += 1
+            stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+
+
+def rows_returned(n):
+    """Count `n` result rows returned by the current request."""
+    stats = _current.get()
+    if stats is not None:
+        with stats._lock:
+            stats.rows += n
+
+
+def render_started(rows=0):
+    """Mark the start of a template render handing `rows` rows to the template."""
+    stats = _current.get()
+    if stats is not None:
+        stats.render_started = time.perf_counter()
+    rows_returned(rows)
+
+
+def render_finished():
+    stats = _current.get()
+    if stats is not None and stats.render_started is not None:
+        stats.render_seconds += time.perf_counter() - stats.render_started
+        stats.render_started = None
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (None,), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        # a list of [upper bound, count] pairs, so JSON keeps the bucket order
+        labels = list(self.bounds) + ['+inf']
+        return {'count': self.count, 'sum': round(self.total, 3),
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'buckets': [list(pair) for pair in zip(labels, self.counts)]}
+
+
+class RouteMetrics:
+    """Per-route histograms of every RequestStats recorded."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, stats):
+        values = {
+            'duration_ms': stats.elapsed() * 1000,
+            'db_ms': stats.db_seconds * 1000,
+            'render_ms': stats.render_seconds * 1000,
+            'statements': stats.statements,
+            'rows': stats.rows,
+        }
+        with self._lock:
+            histograms = self.routes.get(route)
+            if histograms is None:
+                histograms = self.routes[route] = {name: Histogram(b) for name, b in BUCKETS.items()}
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: {name: h.as_dict() for name, h in histograms.items()}
+                    for route, histograms in sorted(self.routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
@@ -0,0 +1,160 @@
+"""
+Parsing and validation of bulk product listing uploads.
+
+An upload is either CSV with a header row or JSON: an array of objects, or
+one object per line (NDJSON). Columns are the Product fields an owner fills
+in on the rent_item form; unknown columns are ignored. `read_records` yields
+the raw records one at a time (a JSON array is the exception and is parsed
+whole) and `validated` checks each as it goes, so an upload is never held in
+memory as model objects and every bad row is reported with its line number.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+
+
+FIELDS = ('name', 'category', 'sub_category', 'rental_price', 'available_quantity')
+REQUIRED = ('name', 'category', 'rental_price', 'available_quantity')
+CATEGORIES = ('mens', 'womens', 'accessories')
+
+MAX_TEXT = 255                        # String(255)
+MAX_PRICE = Decimal('99999999.99')    # Numeric(10, 2)
+MAX_QUANTITY = 2 ** 31 - 1
+
+IMPORT_FORMATS = ('csv', 'json')
+
+# `line` is the line in the file (the position in the array for a JSON array)
+RowError = namedtuple('RowError', 'line field message')
+
+
+class ListingFormatError(ValueError):
+    """The upload as a whole can't be read (wrong format, bad header, not UTF-8)."""
+
+
+def import_format(filename, fmt=None):
+    """'csv' or 'json' from an explicit `fmt` or the file's extension."""
+    if not fmt and filename:
+        fmt = filename.rpartition('.')[2].lower()
+        fmt = {'ndjson': 'json', 'jsonl': 'json'}.get(fmt, fmt)
+    if fmt not in IMPORT_FORMATS:
+        raise ListingFormatError("upload a .csv or .json file")
+    return fmt
+
+
+def _csv_records(text):
+    reader = csv.DictReader(text)
+    header = reader.fieldnames or []
+    missing = [field for field in REQUIRED if field not in header]
+    if missing:
+        raise ListingFormatError(f"CSV header is missing {', '.join(missing)}")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _json_records(text):
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == '[':
+        try:
+            items = json.loads(first + text.read())
+        except ValueError as exc:
+            raise ListingFormatError(f"invalid JSON: {exc}") from None
+        yield from enumerate(items, 1)
+        return
+    # NDJSON: put the character peeked at back in front of the first line
+    for line_no, raw in enumerate(chain([first + text.readline()], text), 1):
+        if not raw.strip():
+            continue
+        try:
+            yield line_no, json.loads(raw)
+        except ValueError as exc:
+            yield line_no, ValueError(f"invalid JSON: {exc}")
+
+
+def read_records(stream, fmt):
+    """(line, record) pairs from a binary upload stream in `fmt`."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    records = _csv_records(text) if fmt == 'csv' else _json_records(text)
+    try:
+        yield from records
+    except UnicodeDecodeError:
+        raise ListingFormatError("the file is not UTF-8 text") from None
+
+
+def _blank(value):
+    return value is None or str(value).strip() == ''
+
+
+def _text(value, field, problems):
+    if _blank(value):
+        return None
+    value = str(value).strip()
+    if len(value) > MAX_TEXT:
+        problems.append((field, f"is longer than {MAX_TEXT} characters"))
+    return value
+
+
+def _price(value, problems):
+    try:
+        price = Decimal(str(value).strip())
+    except InvalidOperation:
+        problems.append(('rental_price', f"{value!r} is not a number"))
+        return None
+    if not price.is_finite() or price <= 0 or price > MAX_PRICE:
+        problems.append(('rental_price', f"must be between 0.01 and {MAX_PRICE}"))
+    elif price.as_tuple().exponent < -2:
+        problems.append(('rental_price', "has more than two decimal places"))
+    return price
+
+
+def _quantity(value, problems):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        problems.append(('available_quantity', f"{value!r} is not a whole number"))
+        return None
+    try:
+        quantity = int(value if isinstance(value, (int, float)) else str(value).strip())
+    except ValueError:
+        problems.append(('available_quantity', f"{value!r} is not a whole number"))
+        return None
+    if not 0 <= quantity <= MAX_QUANTITY:
+        problems.append(('available_quantity', f"must be between 0 and {MAX_QUANTITY}"))
+    return quantity
+
+
+def validate(record):
+    """(values, [(field, message)]) for one raw record; values are usable only without problems."""
+    if isinstance(record, ValueError):
+        return None, [(None, str(record))]
+    if not isinstance(record, dict):
+        return None, [(None, "expected an object with the listing fields")]
+    missing = [field for field in REQUIRED if _blank(record.get(field))]
+    problems = [(field, "is required") for field in missing]
+    values = {
+        'name': _text(record.get('name'), 'name', problems),
+        'category': None,
+        'sub_category': _text(record.get('sub_category'), 'sub_category', problems),
+        'rental_price': None,
+        'available_quantity': None,
+    }
+    if 'category' not in missing:
+        category = str(record['category']).strip().lower()
+        if category in CATEGORIES:
+            values['category'] = category
+        else:
+            problems.append(('category', f"must be one of {', '.join(CATEGORIES)}"))
+    if 'rental_price' not in missing:
+        values['rental_price'] = _price(record['rental_price'], problems)
+    if 'available_quantity' not in missing:
+        values['available_quantity'] = _quantity(record['available_quantity'], problems)
+    return values, problems
+
+
+def validated(records):
+    """(line, values, [RowError]) for each (line, record), validated one at a time."""
+    for line, record in records:
+        values, problems = validate(record)
+        yield line, values, [RowError(line, field, message) for field, message in problems]
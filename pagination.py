@@ -0,0 +1,177 @@
+"""
+Keyset (cursor) pagination for the analytics queries.
+
+A route's query is wrapped as a subquery and ordered by its sort key(s) plus
+the primary key. A page is fetched with a WHERE predicate that continues
+strictly after (or before) the last key seen, so no page ever uses OFFSET and
+page 10,000 costs the same as page 1 when the keys are backed by an index.
+
+Cursors are opaque url-safe strings holding the key values of the boundary row.
+"""
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, literal, or_, select
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page:
+    """One page of rows plus the cursors needed to move forwards/backwards."""
+
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def _encode_value(value):
+    if value is None:
+        return ['n', None]
+    if isinstance(value, bool):
+        return ['i', int(value)]
+    if isinstance(value, int):
+        return ['i', value]
+    if isinstance(value, float):
+        return ['f', repr(value)]
+    if isinstance(value, Decimal):
+        return ['d', str(value)]
+    if isinstance(value, datetime):
+        return ['T', value.isoformat()]
+    if isinstance(value, date):
+        return ['D', value.isoformat()]
+    return ['s', str(value)]
+
+
+_DECODERS = {
+    'n': lambda v: None,
+    'i': int,
+    'f': float,
+    'd': Decimal,
+    'T': datetime.fromisoformat,
+    'D': date.fromisoformat,
+    's': str,
+}
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, width):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = [_DECODERS[tag](v) for tag, v in json.loads(raw)]
+    except (ValueError, KeyError, TypeError, InvalidOperation):
+        raise InvalidCursor(cursor)
+    if len(values) != width:
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _seek(columns, keys, values, forward):
+    """
+    Row-value comparison (k1, k2, ...) > (v1, v2, ...) spelled out as an OR of
+    ANDs so every database can use a composite index on it, and so each key can
+    carry its own sort direction.
+    """
+    clauses = []
+    for i, (name, descending) in enumerate(keys):
+        col = columns[name]
+        after = (col < values[i]) if descending == forward else (col > values[i])
+        equal = [columns[k] == values[j] for j, (k, _) in enumerate(keys[:i])]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def _order(columns, keys, forward=True):
+    order = []
+    for name, descending in keys:
+        col = columns[name]
+        order.append(col.desc() if descending == forward else col.asc())
+    return order
+
+
+def ordered(query, keys):
+    """The whole of `query` as a select in the same order pages are served in."""
+    sq = query.subquery()
+    return select(sq).order_by(*_order(sq.c, keys))
+
+
+def keyset_page(session, query, keys, page_size=DEFAULT_PAGE_SIZE, after=None, before=None):
+    """
+    Fetch one page of `query`.
+
+    `keys` is a list of (column label, descending) pairs naming columns of the
+    query; the last one must be unique (normally the primary key). `after` /
+    `before` are cursors from a previous Page. Returns a Page whose rows keep
+    the column labels of the original query.
+    """
+    sq = query.subquery()
+    columns = sq.c
+    stmt = select(sq)
+    forward = before is None
+    cursor = after if forward else before
+    if cursor:
+        stmt = stmt.where(_seek(columns, keys, decode_cursor(cursor, len(keys)), forward))
+
+    rows = session.execute(stmt.order_by(*_order(columns, keys, forward))
+                           .limit(literal(page_size + 1, literal_execute=True))).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def key_of(row):
+        return encode_cursor([row._mapping[name] for name, _ in keys])
+
+    if not rows:
+        return Page(rows)
+    if forward:
+        next_cursor = key_of(rows[-1]) if has_more else None
+        prev_cursor = key_of(rows[0]) if cursor else None
+    else:
+        next_cursor = key_of(rows[-1])
+        prev_cursor = key_of(rows[0]) if has_more else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def list_page(rows, key, page_size=DEFAULT_PAGE_SIZE, after=None, before=None):
+    """
+    keyset_page over an in-memory list. `rows` must already be sorted
+    ascending by `key(row)`, a tuple of the sort key values; cursors are
+    interchangeable with keyset_page's for the same keys.
+    """
+    forward = before is None
+    cursor = after if forward else before
+    width = len(key(rows[0])) if rows else None
+    values = tuple(decode_cursor(cursor, width)) if cursor and width else None
+    if forward:
+        start = bisect_right(rows, values, key=key) if values else 0
+        page = rows[start:start + page_size]
+        has_more = start + page_size < len(rows)
+    else:
+        end = bisect_left(rows, values, key=key) if values else len(rows)
+        start = max(end - page_size, 0)
+        page = rows[start:end]
+        has_more = start > 0
+    if not page:
+        return Page(page)
+    if forward:
+        next_cursor = encode_cursor(key(page[-1])) if has_more else None
+        prev_cursor = encode_cursor(key(page[0])) if cursor else None
+    else:
+        next_cursor = encode_cursor(key(page[-1]))
+        prev_cursor = encode_cursor(key(page[0])) if has_more else None
+    return Page(page, next_cursor, prev_cursor)
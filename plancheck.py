@@ -0,0 +1,54 @@
+"""
+EXPLAIN-based plan checking.
+
+`capture_statements` records every SELECT the given engines run while a
+block executes, with the engine that ran it; `full_scans` runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) on one of
+them with the same parameters and returns the base tables that are read with
+a full table scan. Used by the `flask check-plans` command.
+"""
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+# SQLAlchemy suffixes aliased tables with _1, _2, ...
+_ALIAS_SUFFIX = re.compile(r'_\d+$')
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?')
+
+
+@contextmanager
+def capture_statements(*engines):
+    statements = []
+
+    def listener(engine):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((engine, statement, parameters))
+        return before_cursor_execute
+
+    listeners = [(engine, listener(engine)) for engine in engines]
+    for engine, fn in listeners:
+        event.listen(engine, 'before_cursor_execute', fn)
+    try:
+        yield statements
+    finally:
+        for engine, fn in listeners:
+            event.remove(engine, 'before_cursor_execute', fn)
+
+
+def full_scans(conn, statement, parameters, tables):
+    """Names from `tables` that the plan for `statement` reads with a full scan."""
+    scanned = set()
+    if conn.dialect.name == 'sqlite':
+        for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+            detail = row[-1]
+            match = _SQLITE_SCAN.match(detail)
+            # "SCAN t USING [COVERING] INDEX ..." walks an index, not the table
+            if match and ' USING ' not in detail:
+                scanned.add(_ALIAS_SUFFIX.sub('', match.group(1)))
+    else:
+        for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings():
+            if row['type'] == 'ALL' and row['table']:
+                scanned.add(_ALIAS_SUFFIX.sub('', row['table']))
+    return scanned & set(tables)
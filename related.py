@@ -0,0 +1,270 @@
+"""
+"Renters also rented": related products from item-item co-occurrence.
+
+Two products co-occur once for every renter who has rented both, and that
+count is their score. The co-occurrence matrix is sparse, but a renter with d
+products still adds d² entries to it, so it is never stored whole. Only each
+product's top-k neighbours are kept, in the RelatedProducts table
+(product_id, related_id, renters), and a product page reads its k rows by
+primary key.
+
+Rebuild: the distinct (renter, product) pairs of Rentals are loaded once as
+two adjacency maps, renter -> products and product -> renters. A product's
+row of the matrix is then the multiset union of its renters' baskets
+(a Counter), built and cut down to k one product at a time. Chunks of
+products are independent, so a rebuild spreads them over a process pool.
+
+Incremental: a renter's first rental of p raises score(p, q) by one for each
+other product q in their basket B, and changes nothing else. The new
+top-k of p can only hold its old top-k or members of B. The new top-k of each
+q can only hold its old top-k or p. So update_for_rentals recomputes just
+those scores, exactly, from Rentals, and merges them into the stored lists
+at O(|B| * k) per new (renter, product) pair.
+
+Removals lower scores, and the stored top-k does not say what would move up
+in their place. When a renter's last rental of p goes, update_for_removals
+recomputes in full the list of p and of each q in their basket whose list
+holds p; forget_products does the same for the lists that held a deleted
+product. A full list is rebuilt from the baskets of the product's renters,
+so removals are dearer than inserts, but every list stays equal to a rebuild.
+"""
+import heapq
+import multiprocessing
+from array import array
+from collections import Counter
+
+from sqlalchemy import and_, bindparam, func, select
+
+
+DEFAULT_TOP_K = 10
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _ranked(scores, k):
+    """The k best (related_id, renters) of `scores`, most renters first, then lowest id."""
+    if len(scores) > k:
+        # rank on the bare counts (no key function per entry), then break
+        # the ties at the cut-off by id
+        floor = heapq.nlargest(k, scores.values())[-1]
+        above = [(q, n) for q, n in scores.items() if n > floor]
+        tied = heapq.nsmallest(k - len(above), [q for q, n in scores.items() if n == floor])
+        scores = dict(above + [(q, floor) for q in tied])
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+#########################################
+# FULL REBUILD
+#########################################
+
+def load_history(conn, rentals):
+    """
+    ({renter_id: array of product ids}, {product_id: array of renter ids}) for
+    every distinct (renter, product) pair in `rentals` (a table or subquery
+    with renter_id and product_id), whatever the status.
+    """
+    c = rentals.c
+    baskets, renters = {}, {}
+    pairs = conn.execution_options(yield_per=50000).execute(
+                select(c.renter_id, c.product_id).distinct()
+                .where(c.renter_id.isnot(None), c.product_id.isnot(None)))
+    for renter_id, product_id in pairs:
+        basket = baskets.get(renter_id)
+        if basket is None:
+            basket = baskets[renter_id] = array('q')
+        basket.append(product_id)
+        product_renters = renters.get(product_id)
+        if product_renters is None:
+            product_renters = renters[product_id] = array('q')
+        product_renters.append(renter_id)
+    return baskets, renters
+
+
+# History shared with worker processes through the Pool initializer, so it is
+# pickled once per worker rather than once per chunk.
+_history = None
+
+
+def _init_history(history):
+    global _history
+    _history = history
+
+
+def _neighbour_chunk(task):
+    """RelatedProducts rows for one chunk of product ids."""
+    product_ids, k = task
+    baskets, renters = _history
+    rows = []
+    for product_id in product_ids:
+        scores = Counter()
+        for renter_id in renters[product_id]:
+            scores.update(baskets[renter_id])
+        del scores[product_id]
+        rows.extend({'product_id': product_id, 'related_id': related_id, 'renters': n}
+                    for related_id, n in _ranked(scores, k))
+    return rows
+
+
+def neighbour_rows(history, k=DEFAULT_TOP_K, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of RelatedProducts rows, one per chunk of products, computed inline or by a process pool."""
+    product_ids = sorted(history[1])
+    tasks = [(product_ids[i:i + chunk_size], k) for i in range(0, len(product_ids), chunk_size)]
+    if workers <= 1 or len(tasks) <= 1:
+        _init_history(history)
+        try:
+            for task in tasks:
+                yield _neighbour_chunk(task)
+        finally:
+            _init_history(None)
+        return
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_history, initargs=(history,)) as pool:
+        yield from pool.imap_unordered(_neighbour_chunk, tasks)
+
+
+#########################################
+# INCREMENTAL UPDATES
+#########################################
+
+def _scores_with(conn, rentals, product_id, others):
+    """{q: renters who rented both product_id and q} for q in `others`."""
+    mine, theirs = rentals.alias('mine'), rentals.alias('theirs')
+    return dict(conn.execute(
+        select(theirs.c.product_id, func.count(mine.c.renter_id.distinct()))
+        .select_from(mine.join(theirs, theirs.c.renter_id == mine.c.renter_id))
+        .where(mine.c.product_id == product_id, theirs.c.product_id.in_(others))
+        .group_by(theirs.c.product_id)).all())
+
+
+def _stored(conn, related, product_ids):
+    """{product_id: {related_id: renters}} as stored for `product_ids`."""
+    c = related.c
+    lists = {pid: {} for pid in product_ids}
+    for product_id, related_id, renters in conn.execute(
+            select(c.product_id, c.related_id, c.renters).where(c.product_id.in_(product_ids))):
+        lists[product_id][related_id] = renters
+    return lists
+
+
+def _write_changes(conn, related, changes):
+    """Apply {product_id: (old {related_id: renters}, new {related_id: renters})} as batched statements."""
+    c = related.c
+    key = and_(c.product_id == bindparam('pid'), c.related_id == bindparam('rid'))
+    deletes, updates, inserts = [], [], []
+    for product_id, (old, new) in changes.items():
+        for related_id, renters in old.items():
+            if related_id not in new:
+                deletes.append({'pid': product_id, 'rid': related_id})
+        for related_id, renters in new.items():
+            if related_id not in old:
+                inserts.append({'product_id': product_id, 'related_id': related_id, 'renters': renters})
+            elif old[related_id] != renters:
+                updates.append({'pid': product_id, 'rid': related_id, 'n': renters})
+    if deletes:
+        conn.execute(related.delete().where(key), deletes)
+    if updates:
+        conn.execute(related.update().where(key).values(renters=bindparam('n')), updates)
+    if inserts:
+        conn.execute(related.insert(), inserts)
+    return bool(deletes or updates or inserts)
+
+
+def update_for_rentals(conn, rentals, related, new_rentals, k=DEFAULT_TOP_K):
+    """
+    Fold freshly inserted rentals, (rental_id, renter_id, product_id) already
+    written to `rentals` (rental_id, renter_id and product_id of every
+    rental), into the stored top-k lists. Returns True if any list changed.
+    """
+    new_ids = [rental_id for rental_id, _, _ in new_rentals]
+    added = {}
+    for _, renter_id, product_id in new_rentals:
+        if renter_id is not None and product_id is not None:
+            added.setdefault(renter_id, set()).add(product_id)
+    if not added:
+        return False
+
+    c = rentals.c
+    changed = False
+    for renter_id, products in added.items():
+        before = set(conn.execute(select(c.product_id).distinct().where(
+                     c.renter_id == renter_id, c.product_id.isnot(None),
+                     c.rental_id.not_in(new_ids))).scalars())
+        basket = before | products
+        for product_id in sorted(products - before):
+            others = basket - {product_id}
+            if not others:
+                continue
+            # only score(product_id, q) = score(q, product_id) moved, for q in others
+            scores = _scores_with(conn, rentals, product_id, others)
+            lists = _stored(conn, related, others | {product_id})
+            changes = {}
+            old = lists.pop(product_id)
+            changes[product_id] = (old, dict(_ranked({**old, **scores}, k)))
+            for other, old in lists.items():
+                changes[other] = (old, dict(_ranked({**old, product_id: scores.get(other, 0)}, k)))
+            changed |= _write_changes(conn, related, changes)
+    return changed
+
+
+def _recompute(conn, rentals, related, product_ids, k, chunk_size=500):
+    """
+    Recompute the lists of `product_ids` in full, as a rebuild would but from
+    just the baskets of their renters; returns True if any list changed.
+    """
+    c = rentals.c
+    renters, baskets = {}, {}
+    for product_id, renter_id in conn.execute(select(c.product_id, c.renter_id).distinct().where(
+            c.product_id.in_(product_ids), c.renter_id.isnot(None))):
+        renters.setdefault(product_id, []).append(renter_id)
+    everyone = sorted(set().union(*renters.values()))
+    for i in range(0, len(everyone), chunk_size):
+        for renter_id, product_id in conn.execute(select(c.renter_id, c.product_id).distinct().where(
+                c.renter_id.in_(everyone[i:i + chunk_size]), c.product_id.isnot(None))):
+            baskets.setdefault(renter_id, []).append(product_id)
+    changes = {}
+    for product_id, old in _stored(conn, related, product_ids).items():
+        scores = Counter()
+        for renter_id in renters.get(product_id, ()):
+            scores.update(baskets[renter_id])
+        scores.pop(product_id, None)
+        changes[product_id] = (old, dict(_ranked(scores, k)))
+    return _write_changes(conn, related, changes)
+
+
+def update_for_removals(conn, rentals, related, removed, k=DEFAULT_TOP_K):
+    """
+    Fold (renter_id, product_id) pairs of rentals just deleted from `rentals`
+    (or moved to another renter or product) into the stored lists. A pair the
+    renter still has another rental of changes nothing. Returns True if any
+    list changed.
+    """
+    c, rc = rentals.c, related.c
+    stale = set()
+    for renter_id, product_id in set(removed):
+        if renter_id is None or product_id is None:
+            continue
+        basket = set(conn.execute(select(c.product_id).distinct().where(
+                     c.renter_id == renter_id, c.product_id.isnot(None))).scalars())
+        if product_id in basket:
+            continue
+        # score(product_id, q) fell by one for each q in the basket
+        stale.add(product_id)
+        if basket:
+            stale.update(conn.execute(select(rc.product_id).where(
+                rc.related_id == product_id, rc.product_id.in_(basket))).scalars())
+    return bool(stale) and _recompute(conn, rentals, related, sorted(stale), k)
+
+
+def forget_products(conn, rentals, related, product_ids, k=DEFAULT_TOP_K):
+    """
+    Drop deleted products from RelatedProducts, as owners and as neighbours,
+    and refill the lists they left short from `rentals` (which no longer
+    holds them).
+    """
+    c = related.c
+    product_ids = list(product_ids)
+    short = set(conn.execute(select(c.product_id).distinct().where(
+                c.related_id.in_(product_ids), c.product_id.not_in(product_ids))).scalars())
+    conn.execute(related.delete().where(c.product_id.in_(product_ids)))
+    conn.execute(related.delete().where(c.related_id.in_(product_ids)))
+    if short:
+        _recompute(conn, rentals, related, sorted(short), k)
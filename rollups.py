@@ -0,0 +1,124 @@
+"""
+Per-user activity rollups: owner earnings, listings and renter spend over time.
+
+UserRollups holds one row per (user, bucket, period) with four measures:
+
+* owner_revenue: total_cost of rentals of the user's products
+* items_listed: products listed, net of removals
+* renter_spend: total_cost of the user's own rentals
+* rental_count: rentals the user made
+
+Rentals count on their rental_start day, listings on the day they are
+written, and every rental counts whatever its status. Buckets start out as
+days ('day'). `compact` folds whole months of day buckets into one 'month'
+bucket dated the 1st, so a user has a row per recent active day plus one per
+older active month. A date range is then answered by summing a few dozen
+buckets. Once compacted, a month's activity dates from its 1st, and a
+range that starts or ends inside a compacted month cannot be answered: the
+days that would split it are gone (see `split_months`).
+
+UserTotals keeps each user's all-time sums, so "total per user" questions
+read one row per user.
+
+Both tables are maintained with additive deltas, and removals are negative
+deltas. Archiving rentals deletes nothing from them.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from sqlalchemy import and_, bindparam, select
+
+
+MEASURES = ('owner_revenue', 'items_listed', 'renter_spend', 'rental_count')
+
+DEFAULT_DAILY_DAYS = 90
+
+TimelineRow = namedtuple('TimelineRow', ('bucket', 'period') + MEASURES)
+
+
+def zero():
+    return (Decimal(0), 0, Decimal(0), 0)
+
+
+def add(a, b, sign=1):
+    return tuple(x + sign * y for x, y in zip(a, b))
+
+
+def apply_delta(conn, table, key, delta):
+    """Add `delta` (one value per measure) to the row of `table` with primary key values `key`, creating it if needed."""
+    where = and_(*(table.c[name] == value for name, value in key.items()))
+    c = table.c
+    result = conn.execute(table.update().where(where).values(
+                 {name: c[name] + value for name, value in zip(MEASURES, delta)}))
+    if result.rowcount == 0:
+        conn.execute(table.insert().values(dict(key, **dict(zip(MEASURES, delta)))))
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def split_months(start, end):
+    """The months that the range [start, end) covers only part of."""
+    return {month_of(day) for day in (start, end) if day.day != 1}
+
+
+def _merge_months(conn, rollups, user_ids, months):
+    """Add {(user_id, month): delta} to the month buckets of `user_ids`, as one batched UPDATE and INSERT."""
+    c = rollups.c
+    existing = set(conn.execute(select(c.user_id, c.bucket).where(
+                   c.period == 'month', c.user_id.in_(user_ids))).all())
+    updates, inserts = [], []
+    for (user_id, month), delta in months.items():
+        if (user_id, month) in existing:
+            updates.append(dict(zip(('d_' + m for m in MEASURES), delta), uid=user_id, month=month))
+        else:
+            inserts.append(dict(zip(MEASURES, delta), user_id=user_id, bucket=month, period='month'))
+    if updates:
+        conn.execute(rollups.update().where(
+            c.user_id == bindparam('uid'), c.bucket == bindparam('month'), c.period == 'month'
+        ).values({m: c[m] + bindparam('d_' + m) for m in MEASURES}), updates)
+    if inserts:
+        conn.execute(rollups.insert(), inserts)
+
+
+def compact(conn, rollups, before, chunk_size=1000):
+    """
+    Fold the day buckets dated before `before` into month buckets, a chunk of
+    users at a time; returns (users, day rows removed). `before` should be
+    the 1st of a month, so that only whole months are folded.
+    """
+    c = rollups.c
+    old_days = and_(c.period == 'day', c.bucket < before)
+    users = removed = 0
+    last = None
+    while True:
+        ids = select(c.user_id).distinct().where(old_days)
+        if last is not None:
+            ids = ids.where(c.user_id > last)
+        ids = conn.execute(ids.order_by(c.user_id).limit(chunk_size)).scalars().all()
+        if not ids:
+            return users, removed
+        months = {}
+        for row in conn.execute(select(c.user_id, c.bucket, *(c[m] for m in MEASURES))
+                                .where(old_days, c.user_id.in_(ids))):
+            key = (row[0], month_of(row[1]))
+            months[key] = add(months.get(key, zero()), row[2:])
+        _merge_months(conn, rollups, ids, months)
+        removed += conn.execute(rollups.delete().where(old_days, c.user_id.in_(ids))).rowcount
+        users += len(ids)
+        last = ids[-1]
+
+
+def timeline(rows, by):
+    """
+    TimelineRows from (bucket, period, *measures) rows in bucket order,
+    regrouped by 'month' or left as stored ('day': recent days, older months).
+    """
+    if by != 'month':
+        return [TimelineRow(*row) for row in rows]
+    merged = {}
+    for bucket, period, *values in rows:
+        month = month_of(bucket)
+        merged[month] = add(merged.get(month, zero()), values)
+    return [TimelineRow(month, 'month', *values) for month, values in merged.items()]
@@ -0,0 +1,372 @@
+"""
+Bulk synthetic data generator for the LendIT schema.
+
+Rows are generated in fixed-size chunks. Every chunk draws from its own
+random stream derived from (seed, table, chunk index), so the output is
+identical for a given seed no matter how many worker processes are used.
+Foreign key pools (owner ids, renter ids, product prices, rental facts) are
+kept in memory as compact arrays and every chunk is written with a single
+multi-row INSERT, so the seeder never reads back what it just wrote.
+
+Usage:
+    python seed.py --users 1e5 --products 1e6 --rentals 5e6 --seed 42 --workers 4
+"""
+import argparse
+import multiprocessing
+import random
+import string
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+from faker import Faker
+
+
+ROLES = ['renter', 'owner', 'admin']
+CATEGORIES = ['mens', 'womens', 'accessories']
+SUB_CATEGORIES = {
+    'mens': ['tuxedo', 'casual', 'formal'],
+    'womens': ['dress', 'casual', 'ethnic'],
+    'accessories': ['watch', 'bag', 'jewelry']
+}
+RENTAL_STATUS = ['ongoing', 'completed', 'canceled']
+PAYMENT_STATUS = ['pending', 'completed', 'failed']
+MAINTENANCE_STATUS = ['pending', 'completed']
+PASSWORD_CHARS = string.ascii_letters + string.digits
+
+# Row counts used when no scale is given (matches the old populate_dummy_data)
+DEFAULT_SCALE = {
+    'users': 50,
+    'products': 50,
+    'rentals': 50,
+    'payments': 50,
+    'reviews': 50,
+}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+#########################################
+# CHUNK GENERATORS (run inside workers)
+#########################################
+
+# Pools shared with worker processes through the Pool initializer so they are
+# pickled once per phase instead of once per chunk.
+_pools = {}
+
+
+def _init_pools(pools):
+    global _pools
+    _pools = pools
+
+
+_fake = None
+
+
+def _streams(seed, table, chunk_index):
+    global _fake
+    if _fake is None:
+        _fake = Faker()
+    rng = random.Random(f"{seed}:{table}:{chunk_index}")
+    _fake.seed_instance(rng.getrandbits(32))
+    return rng, _fake
+
+
+def _user_chunk(task):
+    seed, chunk_index, first_id, count = task
+    rng, fake = _streams(seed, 'users', chunk_index)
+    rows = []
+    for user_id in range(first_id, first_id + count):
+        rows.append({
+            'user_id': user_id,
+            'name': fake.name(),
+            'email': f"user{user_id}@example.com",
+            'phone': f"9{user_id:09d}",
+            'password': ''.join(rng.choices(PASSWORD_CHARS, k=10)),
+            'role': rng.choice(ROLES),
+        })
+    return rows
+
+
+def _product_chunk(task):
+    seed, chunk_index, first_id, count = task
+    rng, fake = _streams(seed, 'products', chunk_index)
+    owner_ids = _pools['owner_ids']
+    anchor = _pools['anchor']
+    products = []
+    maintenances = []
+    for product_id in range(first_id, first_id + count):
+        cat = rng.choice(CATEGORIES)
+        products.append({
+            'product_id': product_id,
+            'name': fake.word().capitalize() + " " + fake.word().capitalize(),
+            'category': cat,
+            'sub_category': rng.choice(SUB_CATEGORIES[cat]),
+            'owner_id': owner_ids[rng.randrange(len(owner_ids))],
+            'rental_price': round(rng.uniform(50, 2000), 2),
+            'available_quantity': rng.randint(1, 10),
+        })
+        last_cleaned = anchor - timedelta(days=rng.randint(0, 182))
+        maintenances.append({
+            'maintenance_id': product_id,
+            'product_id': product_id,
+            'last_cleaned': last_cleaned,
+            'next_cleaning_due': last_cleaned + timedelta(days=30),
+            'status': rng.choice(MAINTENANCE_STATUS),
+        })
+    return products, maintenances
+
+
+def _rental_chunk(task):
+    seed, chunk_index, first_id, count = task
+    rng, _ = _streams(seed, 'rentals', chunk_index)
+    renter_ids = _pools['renter_ids']
+    product_ids = _pools['product_ids']
+    product_prices = _pools['product_prices']
+    anchor = _pools['anchor']
+    rows = []
+    for rental_id in range(first_id, first_id + count):
+        p = rng.randrange(len(product_ids))
+        start_date = anchor - timedelta(days=rng.randint(0, 365))
+        days = rng.randint(1, 15)  # rental period between 1 and 15 days
+        rows.append({
+            'rental_id': rental_id,
+            'renter_id': renter_ids[rng.randrange(len(renter_ids))],
+            'product_id': product_ids[p],
+            'rental_start': start_date,
+            'rental_end': start_date + timedelta(days=days),
+            'total_cost': round(product_prices[p] * days, 2),
+            'status': rng.choice(RENTAL_STATUS),
+        })
+    return rows
+
+
+def _payment_chunk(task):
+    seed, chunk_index, first_id, count = task
+    rng, _ = _streams(seed, 'payments', chunk_index)
+    rental_ids = _pools['rental_ids']
+    rental_renters = _pools['rental_renters']
+    rental_costs = _pools['rental_costs']
+    anchor = _pools['anchor']
+    rows = []
+    for payment_id in range(first_id, first_id + count):
+        r = rng.randrange(len(rental_ids))
+        rows.append({
+            'payment_id': payment_id,
+            'rental_id': rental_ids[r],
+            'user_id': rental_renters[r],
+            'amount': rental_costs[r],
+            'payment_status': rng.choice(PAYMENT_STATUS),
+            'payment_date': datetime.combine(anchor, datetime.min.time())
+                            - timedelta(seconds=rng.randint(0, 365 * 86400)),
+        })
+    return rows
+
+
+def _review_chunk(task):
+    seed, chunk_index, first_id, count = task
+    rng, fake = _streams(seed, 'reviews', chunk_index)
+    rental_renters = _pools['rental_renters']
+    rental_products = _pools['rental_products']
+    user_ids = _pools['user_ids']
+    product_ids = _pools['product_ids']
+    anchor = _pools['anchor']
+    rows = []
+    for review_id in range(first_id, first_id + count):
+        if rental_products:
+            # Reviews are written by someone who actually rented the product
+            r = rng.randrange(len(rental_products))
+            user_id, product_id = rental_renters[r], rental_products[r]
+        else:
+            user_id = user_ids[rng.randrange(len(user_ids))]
+            product_id = product_ids[rng.randrange(len(product_ids))]
+        rows.append({
+            'review_id': review_id,
+            'user_id': user_id,
+            'product_id': product_id,
+            'rating': rng.randint(1, 5),
+            'comment': fake.sentence(),
+            'review_date': datetime.combine(anchor, datetime.min.time())
+                           - timedelta(seconds=rng.randint(0, 365 * 86400)),
+        })
+    return rows
+
+
+#########################################
+# DRIVER
+#########################################
+
+def _tasks(seed, first_id, total, chunk_size):
+    tasks = []
+    for chunk_index, offset in enumerate(range(0, total, chunk_size)):
+        tasks.append((seed, chunk_index, first_id + offset, min(chunk_size, total - offset)))
+    return tasks
+
+
+def _run_phase(fn, tasks, workers, pools):
+    """Yield chunk results in chunk order, generated inline or by a process pool."""
+    if workers <= 1 or len(tasks) <= 1:
+        _init_pools(pools)
+        for task in tasks:
+            yield fn(task)
+        return
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_pools, initargs=(pools,)) as pool:
+        for result in pool.imap(fn, tasks):
+            yield result
+
+
+def _next_id(conn, table):
+    pk = list(table.primary_key.columns)[0]
+    current = conn.execute(table.select().with_only_columns(pk).order_by(pk.desc()).limit(1)).scalar()
+    return (current or 0) + 1
+
+
+def seed_database(engine, metadata, scale=None, seed=0, workers=1,
+                  chunk_size=DEFAULT_CHUNK_SIZE, anchor=None, log=None):
+    """
+    Generate and bulk insert synthetic rows for every table.
+
+    `scale` maps table names (users, products, rentals, payments, reviews) to
+    row counts; missing entries fall back to DEFAULT_SCALE. One Maintenance row
+    is written per product. Dates are generated relative to `anchor` (today by
+    default), so pass a fixed anchor as well as a seed for byte-identical runs.
+
+    Returns {table_name: (rows, seconds)}.
+    """
+    counts = dict(DEFAULT_SCALE)
+    counts.update({k: int(v) for k, v in (scale or {}).items()})
+    anchor = anchor or date.today()
+    tables = metadata.tables
+    stats = {}
+
+    def insert_chunks(name, chunk_results, on_rows):
+        table = tables[name]
+        started = time.perf_counter()
+        total = 0
+        for rows in chunk_results:
+            if not rows:
+                continue
+            with engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+            on_rows(rows)
+            total += len(rows)
+        elapsed = time.perf_counter() - started
+        stats[name] = (total, elapsed)
+        if log:
+            rate = total / elapsed if elapsed else 0.0
+            log(f"{name}: {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+    with engine.connect() as conn:
+        first_ids = {name: _next_id(conn, tables[name])
+                     for name in ('Users', 'Products', 'Rentals', 'Payments', 'Reviews', 'Maintenance')}
+
+    # Users
+    user_ids, owner_ids, renter_ids = array('l'), array('l'), array('l')
+
+    def keep_users(rows):
+        for row in rows:
+            user_ids.append(row['user_id'])
+            if row['role'] == 'owner':
+                owner_ids.append(row['user_id'])
+            elif row['role'] == 'renter':
+                renter_ids.append(row['user_id'])
+
+    tasks = _tasks(seed, first_ids['Users'], counts['users'], chunk_size)
+    insert_chunks('Users', _run_phase(_user_chunk, tasks, workers, {}), keep_users)
+    if not user_ids:
+        return stats
+    # fall back to any user when a role happens to be missing at tiny scales
+    owner_ids = owner_ids or user_ids
+    renter_ids = renter_ids or user_ids
+
+    # Products (+ one Maintenance row each)
+    product_ids, product_prices = array('l'), array('d')
+    maintenance_rows = []
+
+    def keep_products(rows):
+        for row in rows:
+            product_ids.append(row['product_id'])
+            product_prices.append(row['rental_price'])
+
+    def split_products(results):
+        offset = first_ids['Maintenance'] - first_ids['Products']
+        for products, maintenances in results:
+            for row in maintenances:
+                row['maintenance_id'] += offset
+            maintenance_rows.append(maintenances)
+            yield products
+
+    pools = {'owner_ids': owner_ids, 'anchor': anchor}
+    tasks = _tasks(seed, first_ids['Products'], counts['products'], chunk_size)
+    insert_chunks('Products', split_products(_run_phase(_product_chunk, tasks, workers, pools)), keep_products)
+    insert_chunks('Maintenance', iter(maintenance_rows), lambda rows: None)
+    del maintenance_rows[:]
+    if not product_ids:
+        return stats
+
+    # Rentals
+    rental_ids, rental_renters, rental_products, rental_costs = array('l'), array('l'), array('l'), array('d')
+
+    def keep_rentals(rows):
+        for row in rows:
+            rental_ids.append(row['rental_id'])
+            rental_renters.append(row['renter_id'])
+            rental_products.append(row['product_id'])
+            rental_costs.append(row['total_cost'])
+
+    pools = {'renter_ids': renter_ids, 'product_ids': product_ids,
+             'product_prices': product_prices, 'anchor': anchor}
+    tasks = _tasks(seed, first_ids['Rentals'], counts['rentals'], chunk_size)
+    insert_chunks('Rentals', _run_phase(_rental_chunk, tasks, workers, pools), keep_rentals)
+
+    # Payments
+    if rental_ids:
+        pools = {'rental_ids': rental_ids, 'rental_renters': rental_renters,
+                 'rental_costs': rental_costs, 'anchor': anchor}
+        tasks = _tasks(seed, first_ids['Payments'], counts['payments'], chunk_size)
+        insert_chunks('Payments', _run_phase(_payment_chunk, tasks, workers, pools), lambda rows: None)
+
+    # Reviews
+    pools = {'rental_renters': rental_renters, 'rental_products': rental_products,
+             'user_ids': user_ids, 'product_ids': product_ids, 'anchor': anchor}
+    tasks = _tasks(seed, first_ids['Reviews'], counts['reviews'], chunk_size)
+    insert_chunks('Reviews', _run_phase(_review_chunk, tasks, workers, pools), lambda rows: None)
+
+    return stats
+
+
+def _count(value):
+    # accept "100000" as well as "1e5"
+    return int(float(value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load synthetic LendIT data.")
+    for name in DEFAULT_SCALE:
+        parser.add_argument(f"--{name}", type=_count, default=DEFAULT_SCALE[name])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=_count, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--anchor', type=date.fromisoformat, default=None,
+                        help="date the generated history ends on (YYYY-MM-DD, default today)")
+    args = parser.parse_args(argv)
+
+    from app import create_app, db, init_db, rebuild_derived_tables
+
+    scale = {name: getattr(args, name) for name in DEFAULT_SCALE}
+    with create_app().app_context():
+        init_db()
+        stats = seed_database(db.engine, db.metadata, scale=scale, seed=args.seed,
+                              workers=args.workers, chunk_size=args.chunk_size,
+                              anchor=args.anchor, log=print)
+        started = time.perf_counter()
+        rebuild_derived_tables()
+        print(f"derived tables rebuilt in {time.perf_counter() - started:.2f}s")
+    rows = sum(n for n, _ in stats.values())
+    seconds = sum(s for _, s in stats.values())
+    print(f"total: {rows} rows in {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Columnar in-memory snapshot of Users, Products and Rentals (plus the
+archived rentals) for the aggregation-heavy analytics queries.
+
+Only the columns those queries aggregate over are kept, as NumPy arrays:
+ids and foreign keys (int64, -1 for NULL), money in integer cents (so sums
+and "above average" comparisons are exact), rental dates as day ordinals and
+roles / categories / statuses as small integer codes. Names and emails stay
+in the database; routes fetch them by primary key for the rows they show.
+
+`load` reads the three tables in full. `catch_up` appends only the rows above
+each table's primary key high-water mark, which covers inserts; updates and
+deletes are picked up by the next full load. So are archived rentals: they
+are loaded in full only, so a rental never shows up both in Rentals and in
+RentalsArchive at once.
+
+NumPy is optional: without it `available()` is False and callers stay on SQL.
+It is imported on first use rather than with this module, so workers that
+never serve a query from the snapshot don't pay for it.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import select
+
+# numpy, once available() has imported it
+np = None
+
+
+ROLE_CODES = {'renter': 0, 'owner': 1, 'admin': 2}
+CATEGORY_CODES = {'mens': 0, 'womens': 1, 'accessories': 2}
+STATUS_CODES = {'ongoing': 0, 'completed': 1, 'canceled': 2}
+
+CATEGORY_NAMES = {code: name for name, code in CATEGORY_CODES.items()}
+
+_PARTITION = 50000
+
+
+def available():
+    """Whether NumPy can be imported; imports it (once) if so."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - depends on the environment
+            return False
+        np = numpy
+    return True
+
+
+def _cents(value):
+    return int(Decimal(value).scaleb(2).to_integral_value())
+
+
+def from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _fk(value):
+    return -1 if value is None else value
+
+
+# table -> (primary key, [(column, dtype, convert)])
+_SPECS = {
+    'Users': ('user_id', [
+        ('user_id', 'int64', int),
+        ('role', 'int8', ROLE_CODES.get),
+    ]),
+    'Products': ('product_id', [
+        ('product_id', 'int64', int),
+        ('owner_id', 'int64', _fk),
+        ('category', 'int8', CATEGORY_CODES.get),
+        ('rental_price', 'int64', _cents),
+    ]),
+    'Rentals': ('rental_id', [
+        ('rental_id', 'int64', int),
+        ('renter_id', 'int64', _fk),
+        ('product_id', 'int64', _fk),
+        ('rental_start', 'int32', lambda d: d.toordinal()),
+        ('rental_end', 'int32', lambda d: d.toordinal()),
+        ('total_cost', 'int64', _cents),
+        ('status', 'int8', STATUS_CODES.get),
+    ]),
+    'RentalsArchive': ('rental_id', [
+        ('rental_id', 'int64', int),
+        ('renter_id', 'int64', _fk),
+        ('product_id', 'int64', _fk),
+        ('rental_start', 'int32', lambda d: d.toordinal()),
+        ('rental_end', 'int32', lambda d: d.toordinal()),
+        ('total_cost', 'int64', _cents),
+    ]),
+}
+
+# tables refreshed by full loads only (see the module docstring)
+_FULL_LOAD_ONLY = {'RentalsArchive'}
+
+
+def _read(conn, table, pk, columns, after):
+    """Column arrays for the rows of `table` with pk > after, in pk order."""
+    stmt = (select(*[table.c[name] for name, _, _ in columns])
+            .where(table.c[pk] > after).order_by(table.c[pk]))
+    parts = {name: [] for name, _, _ in columns}
+    result = conn.execution_options(stream_results=True, yield_per=_PARTITION).execute(stmt)
+    for partition in result.partitions():
+        for i, (name, dtype, convert) in enumerate(columns):
+            parts[name].append(np.fromiter((convert(row[i]) for row in partition),
+                                           dtype=dtype, count=len(partition)))
+    return {name: np.concatenate(chunks) if chunks else np.empty(0, dtype)
+            for (name, dtype, _), chunks in zip(columns, parts.values())}
+
+
+class Rows:
+    """
+    Read-only sequence of row tuples over equal-length column arrays, each
+    value passed through its column's converter. Only the rows actually
+    indexed or sliced are turned into Python objects, so a route can bisect
+    and page a large result cheaply.
+    """
+
+    def __init__(self, columns, converters):
+        self.columns = columns
+        self.converters = converters
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def _row(self, i):
+        return tuple(convert(col[i]) for col, convert in zip(self.columns, self.converters))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        return self._row(index)
+
+
+def _memoized(method):
+    """Cache a query's Rows until the snapshot next changes."""
+    name = method.__name__
+
+    def wrapper(self):
+        with self._lock:
+            generation = self.generation
+            cached = self._results.get(name)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        rows = method(self)
+        with self._lock:
+            self._results[name] = (generation, rows)
+        return rows
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def _group_count_sum(keys, values):
+    """
+    (distinct non-negative keys ascending, rows per key, sum of values per key).
+    Ids are dense, so this is a bincount; float64 weights are exact integers
+    up to 2**53, far beyond any total here.
+    """
+    valid = keys >= 0
+    keys, values = keys[valid], values[valid]
+    counts = np.bincount(keys)
+    sums = np.bincount(keys, weights=values, minlength=len(counts))
+    present = np.flatnonzero(counts)
+    return present, counts[present], np.rint(sums[present]).astype('int64')
+
+
+class AnalyticsSnapshot:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.columns = {}        # table -> {column: array}
+        self.high_water = {}     # table -> largest primary key loaded
+        self.loaded = False
+        self.loaded_at = None    # last full load
+        self.caught_up_at = None
+        self.generation = 0      # bumped whenever the data changes
+        self._results = {}
+
+    def load(self, conn, tables):
+        """Replace the snapshot with the current contents of `tables` (name -> Table)."""
+        if not available():
+            raise RuntimeError("the analytics snapshot needs NumPy")
+        columns = {name: _read(conn, tables[name], pk, spec, 0) for name, (pk, spec) in _SPECS.items()}
+        with self._lock:
+            self.columns = columns
+            self.high_water = {name: int(cols[pk][-1]) if len(cols[pk]) else 0
+                               for (name, (pk, _)), cols in zip(_SPECS.items(), columns.values())}
+            self.loaded = True
+            self.loaded_at = self.caught_up_at = time.monotonic()
+            self.generation += 1
+
+    def catch_up(self, conn, tables):
+        """Append rows inserted since the last load or catch-up; returns how many."""
+        added = 0
+        with self._lock:
+            for name, (pk, spec) in _SPECS.items():
+                if name in _FULL_LOAD_ONLY:
+                    continue
+                new = _read(conn, tables[name], pk, spec, self.high_water[name])
+                if len(new[pk]):
+                    old = self.columns[name]
+                    self.columns[name] = {col: np.concatenate([old[col], new[col]]) for col in old}
+                    self.high_water[name] = int(new[pk][-1])
+                    added += len(new[pk])
+            if added:
+                self.generation += 1
+            self.caught_up_at = time.monotonic()
+        return added
+
+    def _tables(self):
+        with self._lock:
+            return self.columns['Users'], self.columns['Products'], self.columns['Rentals']
+
+    def _history(self, *columns):
+        """`columns` of every rental, hot and archived, concatenated."""
+        with self._lock:
+            hot, archived = self.columns['Rentals'], self.columns['RentalsArchive']
+        return {col: np.concatenate([hot[col], archived[col]]) for col in columns}
+
+    # The queries below mirror the SQL versions in app.py row for row; each
+    # returns Rows sorted by the leading id column.
+
+    @_memoized
+    def buyers_above_avg(self):
+        """(user_id,) for users whose rental spend, archived rentals included, exceeds the average rental cost."""
+        users, _, _ = self._tables()
+        rentals = self._history('renter_id', 'total_cost')
+        cost = rentals['total_cost']
+        if not len(cost):
+            return Rows([], [])
+        renters, _, spent = _group_count_sum(rentals['renter_id'], cost)
+        # spent > total / n, kept in integers
+        keep = (spent * len(cost) > int(cost.sum())) & np.isin(renters, users['user_id'])
+        return Rows([renters[keep]], [int])
+
+    @_memoized
+    def products_above_avg_price(self):
+        """(product_id, category, rental_price) priced above their category's average."""
+        _, products, _ = self._tables()
+        category, price = products['category'], products['rental_price']
+        counts = np.bincount(category, minlength=len(CATEGORY_CODES))
+        sums = np.zeros(len(counts), dtype='int64')
+        np.add.at(sums, category, price)
+        keep = price * counts[category] > sums[category]
+        return Rows([products['product_id'][keep], category[keep], price[keep]],
+                    [int, lambda c: CATEGORY_NAMES[int(c)], from_cents])
+
+    @_memoized
+    def multifunction_users(self):
+        """(user_id, products listed, rental spend) for users with >2 products and >700 spent, archived rentals included."""
+        min_products, min_spent_cents = 2, 70000
+        users, products, _ = self._tables()
+        rentals = self._history('renter_id', 'total_cost')
+        owners, listed, _ = _group_count_sum(products['owner_id'], products['rental_price'])
+        renters, _, spent = _group_count_sum(rentals['renter_id'], rentals['total_cost'])
+        owners, listed = owners[listed > min_products], listed[listed > min_products]
+        renters, spent = renters[spent > min_spent_cents], spent[spent > min_spent_cents]
+        both = np.intersect1d(np.intersect1d(owners, renters), users['user_id'])
+        listed = listed[np.searchsorted(owners, both)]
+        spent = spent[np.searchsorted(renters, both)]
+        return Rows([both, listed, spent], [int, int, from_cents])
+
+    @_memoized
+    def avg_renting_duration(self):
+        """(product_id, average rental length in days) for rented products, archived rentals included."""
+        _, products, _ = self._tables()
+        rentals = self._history('product_id', 'rental_start', 'rental_end')
+        days = (rentals['rental_end'] - rentals['rental_start']).astype('int64')
+        rented, counts, total_days = _group_count_sum(rentals['product_id'], days)
+        keep = np.isin(rented, products['product_id'])
+        return Rows([rented[keep], total_days[keep] / counts[keep]], [int, float])
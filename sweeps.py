@@ -0,0 +1,194 @@
+"""
+Chunked background sweeps over the large tables.
+
+A sweep walks one table in primary key order, a chunk of keys at a time, and
+applies set-based UPDATEs to the rows in (lo, hi] of each chunk. Every chunk
+is its own short transaction, and the checkpoint (the last key done) is
+advanced in that same transaction. A sweep that stops or crashes resumes from
+its checkpoint; a second runner that finds the checkpoint moved under it
+stops rather than redo a chunk. When a sweep
+reaches the end of the table its checkpoint goes back to 0 for the next pass.
+No row is ever loaded into Python: each chunk costs a handful of statements
+whatever its size.
+
+Sweeps:
+
+* `close_rentals`: ongoing rentals whose rental_end has passed become completed.
+* `reconcile_payments`: a pending payment for a canceled (or deleted) rental
+  fails; one whose amount equals its rental's total_cost completes; anything
+  else stays pending and is counted as a mismatch.
+
+archive.py defines two more sweeps that move old rentals, payments and
+reviews to the archive tables.
+
+Each run returns a RunReport with per-run counts, throughput and lag (how long
+the oldest row it fixed had been waiting).
+"""
+import json
+import time
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import and_, exists, func, not_, or_, select
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+RunReport = namedtuple('RunReport', 'job started_at seconds start_key end_key finished '
+                                    'chunks scanned updated counts rows_per_second lag_seconds')
+
+
+class Sweep:
+    """
+    One sweep: `table` walked by `key`. `chunk(conn, tables, lo, hi, today, now)`
+    updates the rows in (lo, hi] and returns (rows changed, {counter: n},
+    lag seconds or None). `writes` names every table a chunk may change
+    (just `table` by default).
+    """
+
+    def __init__(self, name, table, key, chunk, description, writes=None):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.chunk = chunk
+        self.description = description
+        self.writes = writes or (table,)
+
+
+def _age(now, oldest):
+    """Seconds `oldest` (a date or datetime) lies before `now`, or None."""
+    if oldest is None:
+        return None
+    if not isinstance(oldest, datetime):
+        oldest = datetime.combine(oldest, datetime.min.time())
+    return max((now - oldest).total_seconds(), 0.0)
+
+
+def close_rentals_chunk(conn, tables, lo, hi, today, now):
+    rentals = tables['Rentals']
+    c = rentals.c
+    overdue = and_(c.rental_id > lo, c.rental_id <= hi,
+                   c.status == 'ongoing', c.rental_end < today)
+    oldest = conn.execute(select(func.min(c.rental_end)).where(overdue)).scalar()
+    if oldest is None:
+        return 0, {'closed': 0}, None
+    closed = conn.execute(rentals.update().where(overdue).values(status='completed')).rowcount
+    return closed, {'closed': closed}, _age(datetime.combine(today, datetime.min.time()), oldest)
+
+
+def reconcile_payments_chunk(conn, tables, lo, hi, today, now):
+    payments, rentals = tables['Payments'], tables['Rentals']
+    p, r = payments.c, rentals.c
+    pending = and_(p.payment_id > lo, p.payment_id <= hi, p.payment_status == 'pending')
+    oldest = conn.execute(select(func.min(p.payment_date)).where(pending)).scalar()
+    if oldest is None:
+        return 0, {'completed': 0, 'failed': 0, 'mismatched': 0}, None
+    live_rental = exists().where(r.rental_id == p.rental_id, r.status != 'canceled')
+    failed = conn.execute(payments.update().where(pending, or_(p.rental_id.is_(None), not_(live_rental)))
+                          .values(payment_status='failed')).rowcount
+    completed = conn.execute(payments.update().where(
+                    pending, exists().where(r.rental_id == p.rental_id, r.status != 'canceled',
+                                            r.total_cost == p.amount))
+                    .values(payment_status='completed')).rowcount
+    mismatched = conn.execute(select(func.count()).where(pending)).scalar()
+    lag = _age(now, oldest) if failed or completed else None
+    return failed + completed, {'completed': completed, 'failed': failed, 'mismatched': mismatched}, lag
+
+
+SWEEPS = {
+    'close_rentals': Sweep('close_rentals', 'Rentals', 'rental_id', close_rentals_chunk,
+                           "Complete ongoing rentals whose end date has passed"),
+    'reconcile_payments': Sweep('reconcile_payments', 'Payments', 'payment_id', reconcile_payments_chunk,
+                                "Settle or fail pending payments against their rentals"),
+}
+
+
+def _chunk_end(conn, table, key, lo, chunk_size):
+    """(hi, rows): the chunk after `lo` is (lo, hi] and holds `rows` rows; hi is None at the end."""
+    k = table.c[key]
+    hi = conn.execute(select(k).where(k > lo).order_by(k).offset(chunk_size - 1).limit(1)).scalar()
+    if hi is not None:
+        return hi, chunk_size
+    hi, rows = conn.execute(select(func.max(k), func.count()).where(k > lo)).one()
+    return hi, rows
+
+
+def _checkpoint(conn, checkpoints, job):
+    row = conn.execute(select(checkpoints.c.last_key).where(checkpoints.c.job == job)).first()
+    if row is None:
+        conn.execute(checkpoints.insert().values(job=job, last_key=0, updated_at=datetime.utcnow()))
+        return 0
+    return row[0]
+
+
+def run(session, tables, sweep, chunk_size=DEFAULT_CHUNK_SIZE, max_seconds=None, on_chunk=None, params=None):
+    """
+    Run `sweep` from its checkpoint to the end of the table, or until
+    `max_seconds` have passed, committing once per chunk. `tables` maps table
+    names to Tables, including JobCheckpoints and JobRuns; the run's
+    RunReport is recorded in JobRuns and returned. `on_chunk(session)` is
+    called before committing a chunk that changed rows, e.g. to note the
+    tables written. `params` are extra keyword arguments for the chunk
+    function. If a chunk raises, it is rolled back and the checkpoint
+    stays where it was.
+    """
+    checkpoints = tables['JobCheckpoints']
+    table = tables[sweep.table]
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    conn = session.connection()
+    start_key = lo = _checkpoint(conn, checkpoints, sweep.name)
+    session.commit()
+
+    chunks = scanned = updated = 0
+    counts = {}
+    lag = None
+    finished = False
+    while max_seconds is None or time.perf_counter() - started < max_seconds:
+        conn = session.connection()
+        hi, rows = _chunk_end(conn, table, sweep.key, lo, chunk_size)
+        finished = hi is None
+        # claim the chunk first: the row lock keeps a second runner off it
+        # until this commits, after which its claim finds the checkpoint moved
+        claimed = conn.execute(checkpoints.update().where(
+                      checkpoints.c.job == sweep.name, checkpoints.c.last_key == lo
+                  ).values(last_key=0 if finished else hi, updated_at=datetime.utcnow())).rowcount
+        if not claimed:
+            session.rollback()
+            finished = False
+            break
+        if finished:
+            session.commit()
+            break
+        # rental dates are local, like the booking pages; payment times are UTC
+        try:
+            changed, chunk_counts, chunk_lag = sweep.chunk(conn, tables, lo, hi, date.today(), datetime.utcnow(),
+                                                           **(params or {}))
+        except Exception:
+            session.rollback()
+            raise
+        if changed and on_chunk:
+            on_chunk(session)
+        session.commit()
+        for name, n in chunk_counts.items():
+            counts[name] = counts.get(name, 0) + n
+        if chunk_lag is not None and (lag is None or chunk_lag > lag):
+            lag = chunk_lag
+        updated += changed
+        scanned += rows
+        chunks += 1
+        lo = hi
+
+    seconds = time.perf_counter() - started
+    report = RunReport(sweep.name, started_at, round(seconds, 3), start_key, lo, finished,
+                       chunks, scanned, updated, counts,
+                       round(scanned / seconds, 1) if seconds else 0.0,
+                       None if lag is None else round(lag, 1))
+    session.connection().execute(tables['JobRuns'].insert().values(
+        job=report.job, started_at=report.started_at, seconds=report.seconds,
+        start_key=report.start_key, end_key=report.end_key, finished=report.finished,
+        chunks=report.chunks, scanned=report.scanned, updated=report.updated,
+        counts=json.dumps(report.counts), rows_per_second=report.rows_per_second,
+        lag_seconds=report.lag_seconds))
+    session.commit()
+    return report
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, init_db, result_cache, User  # noqa: E402
+
+
+@pytest.fixture
+def app_config():
+    """Settings the app fixture adds to its own; override it in a test module."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """The app on an empty SQLite database of its own, inside an app context."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "lendit.db"}',
+                      'TESTING': True, **app_config})
+    with app.app_context():
+        init_db()
+        yield app
+        db.session.remove()
+        result_cache.invalidate(db.metadata.tables.keys())
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def users(app):
+    """Two owners and two renters."""
+    people = [User(name=f'{role} {i}', email=f'{role}{i}@example.com', phone=f'555000{n}',
+                   password='x', role=role)
+              for n, (role, i) in enumerate([('owner', 1), ('owner', 2), ('renter', 1), ('renter', 2)])]
+    db.session.add_all(people)
+    db.session.commit()
+    return people
@@ -0,0 +1,60 @@
+from app import Product, User, db, rebuild_product_stats, result_cache
+import cache
+
+
+def _get(client, path, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(path, query_string={'format': 'json'}, headers=headers)
+
+
+def test_pages_hit_the_cache_and_revalidate_until_a_write(client, users):
+    first = _get(client, '/query_renters')
+    hits = result_cache.hits
+    assert _get(client, '/query_renters').get_json() == first.get_json()
+    assert result_cache.hits == hits + 1
+
+    etag = first.headers['ETag']
+    revalidated = _get(client, '/query_renters', etag)
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+
+    db.session.add(User(name='renter 3', email='renter3@example.com', phone='5550009',
+                        password='x', role='renter'))
+    db.session.commit()
+    changed = _get(client, '/query_renters', etag)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()['rows']) == 3
+
+
+def test_writes_to_product_stats_invalidate_the_routes_reading_it(client, users):
+    db.session.add(Product(name='Tux', category='mens', rental_price=20, available_quantity=1,
+                           owner_id=users[0].user_id))
+    db.session.commit()
+    paths = ['/query_top_revenue', '/query_avg_renting_duration', '/query_products_not_rented',
+             '/query_filter_womens_rating', '/query_sort_products_avg_rating']
+    etags = {path: _get(client, path).headers['ETag'] for path in paths}
+
+    rebuild_product_stats()
+
+    for path in paths:
+        assert _get(client, path, etags[path]).status_code == 200, path
+
+
+def test_lru_versions_age_out_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    backend = cache.LRUBackend(ttl=30)
+    assert backend.get_versions(['Users']) == [0]
+    now[0] += 29
+    assert backend.get_versions(['Users']) == [0]
+    # another process may have written Users by now
+    now[0] += 1
+    assert backend.get_versions(['Users']) == [1]
+    backend.bump(['Users'])
+    now[0] += 29
+    assert backend.get_versions(['Users']) == [2]
+
+    forever = cache.LRUBackend(ttl=0)
+    now[0] += 10 ** 6
+    assert forever.get_versions(['Users']) == [0]
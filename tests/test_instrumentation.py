@@ -0,0 +1,43 @@
+from app import User, db, route_metrics
+
+
+def _timing(response):
+    """Server-Timing as {metric: desc}."""
+    parts = [part.strip().split(';') for part in response.headers['Server-Timing'].split(',')]
+    return {part[0]: dict(p.split('=', 1) for p in part[1:]) for part in parts}
+
+
+def _recorded(route):
+    return route_metrics.snapshot()[route]
+
+
+def test_json_pages_report_their_rows_and_statements(client, users):
+    route_metrics.reset()
+    response = client.get('/query_renters', query_string={'format': 'json'})
+
+    timing = _timing(response)
+    assert timing['render']['desc'] == '"2 rows"'
+    assert timing['db']['desc'] != '"0 statements"'
+    assert _recorded('/query_renters')['rows']['sum'] == 2
+
+
+def test_html_pages_report_the_rows_rendered(client, users):
+    response = client.get('/query_renters')
+    assert _timing(response)['render']['desc'] == '"2 rows"'
+
+
+def test_streamed_exports_are_recorded_once_sent(client, users):
+    for i in range(3, 8):
+        db.session.add(User(name=f'renter {i}', email=f'renter{i}@example.com', phone=f'55501{i}',
+                            password='x', role='renter'))
+    db.session.commit()
+    route_metrics.reset()
+
+    response = client.get('/query_renters', query_string={'format': 'csv'})
+    assert 'Server-Timing' not in response.headers
+    assert len(response.get_data(as_text=True).splitlines()) == 1 + 7
+    response.close()
+
+    recorded = _recorded('/query_renters')
+    assert recorded['rows']['sum'] == 7
+    assert recorded['statements']['sum'] >= 1
@@ -0,0 +1,22 @@
+from app import Product, db, import_listings
+
+
+def _products_by_owner(client):
+    page = client.get('/query_products_by_user', query_string={'format': 'json'}).get_json()
+    return {row['user_id']: row['total_products'] for row in page['rows']}
+
+
+def test_bulk_import_counts_in_products_by_owner(client, users):
+    owner = users[0]
+    db.session.add(Product(name='Tux', category='mens', rental_price=20, available_quantity=1,
+                           owner_id=owner.user_id))
+    db.session.commit()
+    assert _products_by_owner(client) == {owner.user_id: 1}
+
+    records = [(line, {'name': f'Dress {line}', 'category': 'womens', 'rental_price': '15.00',
+                       'available_quantity': '2'}) for line in range(2, 7)]
+    report = import_listings(owner.user_id, records)
+
+    assert report.imported == 5
+    assert Product.query.filter_by(owner_id=owner.user_id).count() == 6
+    assert _products_by_owner(client) == {owner.user_id: 6}
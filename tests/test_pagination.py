@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app import Product, Rental, db
+
+
+def _walk(client, path, page_size):
+    """Every row of `path`, following next_cursor from the first page to the last."""
+    rows, after = [], None
+    while True:
+        args = {'format': 'json', 'page_size': page_size}
+        if after:
+            args['after'] = after
+        page = client.get(path, query_string=args).get_json()
+        rows += page['rows']
+        after = page['next_cursor']
+        if not after:
+            return rows
+
+
+def _cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def test_malformed_cursors_are_rejected(client, users):
+    for cursor in ['not base64!', _cursor([['d', 'x'], ['i', 1]]), _cursor([['i', 1]]),
+                   _cursor([['?', 1], ['i', 1]])]:
+        response = client.get('/query_top_revenue', query_string={'after': cursor})
+        assert response.status_code == 400, cursor
+
+
+def test_pages_cover_every_row_once_in_both_directions(client, users):
+    renter_ids = [users[2].user_id, users[3].user_id]
+    assert [row['user_id'] for row in _walk(client, '/query_renters', page_size=1)] == renter_ids
+
+    args = {'format': 'json', 'page_size': 1}
+    first = client.get('/query_renters', query_string=args).get_json()
+    second = client.get('/query_renters', query_string={**args, 'after': first['next_cursor']}).get_json()
+    back = client.get('/query_renters', query_string={**args, 'before': second['prev_cursor']}).get_json()
+    assert [row['user_id'] for row in second['rows']] == renter_ids[1:]
+    assert back['rows'] == first['rows']
+
+
+def test_top_revenue_pages_have_no_duplicates_or_gaps(client, users):
+    owner, _, renter, _ = users
+    products = [Product(name=f'Gown {i}', category='womens', rental_price=10, available_quantity=1,
+                        owner_id=owner.user_id) for i in range(4)]
+    db.session.add_all(products)
+    db.session.commit()
+    # 0.10 + 0.20 is not 0.30 in binary floating point, which is what SQLite sums in
+    start = date(2024, 5, 1)
+    for product in products:
+        for cost in ('0.10', '0.20'):
+            db.session.add(Rental(renter_id=renter.user_id, product_id=product.product_id,
+                                  rental_start=start, rental_end=start + timedelta(days=1),
+                                  total_cost=Decimal(cost), status='completed'))
+            db.session.commit()
+
+    for page_size in (1, 2, 3):
+        rows = _walk(client, '/query_top_revenue', page_size)
+        assert [row['product_id'] for row in rows] == [p.product_id for p in products]
+        assert {row['revenue'] for row in rows} == {'0.30'}
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app import Product, ProductStats, Rental, Review, db, rebuild_product_stats
+
+
+def _raw_stats():
+    """ProductStats as stored, without the Numeric type's rounding on the way out."""
+    return {row[0]: tuple(row[1:]) for row in db.session.execute(text(
+        'SELECT product_id, review_count, rating_sum, rating_avg, rental_count, revenue_sum, rental_days '
+        'FROM ProductStats'))}
+
+
+def _rent(renter, product, cost, days=2):
+    start = date(2024, 5, 1)
+    return Rental(renter_id=renter.user_id, product_id=product.product_id, rental_start=start,
+                  rental_end=start + timedelta(days=days), total_cost=Decimal(cost), status='completed')
+
+
+def test_counters_match_a_fresh_aggregate(users):
+    owner, _, renter, other = users
+    tux = Product(name='Tux', category='mens', rental_price=20, available_quantity=1, owner_id=owner.user_id)
+    gown = Product(name='Gown', category='womens', rental_price=30, available_quantity=1, owner_id=owner.user_id)
+    db.session.add_all([tux, gown])
+    db.session.commit()
+
+    rentals = []
+    for cost in ('0.10', '0.20', '0.70', '19.99', '0.01'):
+        rentals.append(_rent(renter, tux, cost))
+        db.session.add(rentals[-1])
+        db.session.commit()
+    db.session.add_all([_rent(other, gown, '45.50', days=3),
+                        Review(user_id=renter.user_id, product_id=tux.product_id, rating=4),
+                        Review(user_id=other.user_id, product_id=tux.product_id, rating=5)])
+    db.session.commit()
+
+    rentals[1].total_cost = Decimal('0.30')
+    rentals[2].rental_end += timedelta(days=4)
+    db.session.commit()
+    rentals[3].product_id = gown.product_id
+    db.session.delete(rentals[4])
+    db.session.commit()
+
+    stats = db.session.get(ProductStats, tux.product_id)
+    assert (stats.rental_count, stats.revenue_sum, stats.rental_days) == (3, Decimal('1.10'), 10)
+    assert (stats.review_count, stats.rating_sum, stats.rating_avg) == (2, 9, 4.5)
+    incremental = _raw_stats()
+    rebuild_product_stats()
+    assert incremental == _raw_stats()
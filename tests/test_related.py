@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import Product, RelatedProduct, Rental, db, rebuild_related_products
+
+
+def _lists():
+    return sorted((r.product_id, r.related_id, r.renters) for r in RelatedProduct.query)
+
+
+def _rent(renter, product, days_ago=0):
+    start = date.today() - timedelta(days=days_ago)
+    return Rental(renter_id=renter.user_id, product_id=product.product_id, rental_start=start,
+                  rental_end=start + timedelta(days=1), total_cost=Decimal('10.00'), status='completed')
+
+
+@pytest.fixture
+def catalog(app, users):
+    """Six products, rented so that the top-2 lists have runners-up."""
+    app.config['RELATED_TOP_K'] = 2
+    owner, _, first, second = users
+    products = [Product(name=f'Item {i}', category='mens', rental_price=10, available_quantity=1,
+                        owner_id=owner.user_id) for i in range(6)]
+    db.session.add_all(products)
+    db.session.commit()
+    baskets = {first: [0, 1, 2, 3, 3], second: [0, 1, 2, 4, 5]}
+    for renter, picks in baskets.items():
+        for days_ago, i in enumerate(picks):
+            db.session.add(_rent(renter, products[i], days_ago))
+            db.session.commit()
+    return products
+
+
+def test_inserts_match_rebuild(catalog):
+    incremental = _lists()
+    rebuild_related_products()
+    assert incremental == _lists()
+
+
+def test_deleting_a_rental_matches_rebuild(catalog, users):
+    first = users[2]
+    # the renter's only rental of item 1; their two rentals of item 3 leave it related
+    db.session.delete(Rental.query.filter_by(renter_id=first.user_id, product_id=catalog[1].product_id).one())
+    db.session.delete(Rental.query.filter_by(renter_id=first.user_id, product_id=catalog[3].product_id).first())
+    db.session.commit()
+    incremental = _lists()
+    rebuild_related_products()
+    assert incremental == _lists()
+
+
+def test_moving_a_rental_matches_rebuild(catalog, users):
+    rental = Rental.query.filter_by(renter_id=users[3].user_id, product_id=catalog[0].product_id).one()
+    rental.product_id = catalog[3].product_id
+    db.session.commit()
+    incremental = _lists()
+    rebuild_related_products()
+    assert incremental == _lists()
+
+
+def test_deleting_a_product_matches_rebuild(catalog):
+    db.session.delete(catalog[0])
+    db.session.commit()
+    incremental = _lists()
+    assert all(catalog[0].product_id not in row[:2] for row in incremental)
+    rebuild_related_products()
+    assert incremental == _lists()
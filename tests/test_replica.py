@@ -0,0 +1,57 @@
+import shutil
+
+import pytest
+from sqlalchemy import event
+
+from app import Product, REPLICA_BIND, User, db
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'SQLALCHEMY_BINDS': {REPLICA_BIND: f'sqlite:///{tmp_path / "replica.db"}'}}
+
+
+@pytest.fixture
+def replica(app, users, tmp_path):
+    """A copy of the primary as it is now, which later writes never reach."""
+    shutil.copy(tmp_path / 'lendit.db', tmp_path / 'replica.db')
+
+
+def _renters(client):
+    page = client.get('/query_renters', query_string={'format': 'json'}).get_json()
+    return [row['name'] for row in page['rows']]
+
+
+def _add_renter(name, phone):
+    db.session.add(User(name=name, email=f'{name.replace(" ", "")}@example.com', phone=phone,
+                        password='x', role='renter'))
+    db.session.commit()
+
+
+def test_read_only_routes_read_the_replica(client, users, replica):
+    db.session.add(Product(name='Tux', category='mens', rental_price=20, available_quantity=1,
+                           owner_id=users[0].user_id))
+    db.session.commit()
+
+    sorted_page = client.get('/sort_products_price', query_string={'format': 'json'}).get_json()
+    assert sorted_page['rows'] == []
+
+
+def test_pages_filled_right_after_a_write_read_the_primary(app, client, users, replica):
+    _add_renter('renter 3', '5550010')
+    assert _renters(client) == ['renter 1', 'renter 2', 'renter 3']
+
+    # outside the lag window the (stale) replica answers
+    app.config['REPLICA_LAG_SECONDS'] = 0
+    _add_renter('renter 4', '5550011')
+    assert _renters(client) == ['renter 1', 'renter 2']
+
+
+def test_check_plans_explains_the_statements_run_on_the_replica(app, users, replica):
+    statements = []
+    replica_engine = db.engines[REPLICA_BIND]
+    event.listen(replica_engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    result = app.test_cli_runner().invoke(args=['check-plans'])
+    assert any('FROM "Users"' in statement for statement in statements)
+    assert 'ran no SQL' not in result.output
+    assert 'ok   query_renters' in result.output
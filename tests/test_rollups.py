@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app import (Product, Rental, RentalArchive, UserRollup, UserTotals, db,
+                 compact_user_rollups, rebuild_user_rollups)
+import rollups
+
+
+def _rollups():
+    """Both tables as {key: measures}, without all-zero rows."""
+    def measures(row):
+        return tuple(Decimal(str(getattr(row, m))).quantize(Decimal('0.01')) for m in rollups.MEASURES)
+    buckets = {(r.user_id, r.bucket, r.period): measures(r) for r in UserRollup.query}
+    totals = {r.user_id: measures(r) for r in UserTotals.query}
+    return ({k: v for k, v in buckets.items() if any(v)},
+            {k: v for k, v in totals.items() if any(v)})
+
+
+def _rent(renter, product, start, cost):
+    return Rental(renter_id=renter.user_id, product_id=product.product_id, rental_start=start,
+                  rental_end=start + timedelta(days=2), total_cost=Decimal(cost), status='completed')
+
+
+def _assert_matches_rebuild():
+    compact_user_rollups()
+    incremental = _rollups()
+    rebuild_user_rollups()
+    assert incremental == _rollups()
+
+
+def test_owner_change_moves_revenue_like_the_rebuild(users):
+    first, second, renter, other = users
+    today = date.today()
+    tux = Product(name='Tux', category='mens', rental_price=20, available_quantity=1, owner_id=first.user_id)
+    gown = Product(name='Gown', category='womens', rental_price=30, available_quantity=1, owner_id=first.user_id)
+    db.session.add_all([tux, gown])
+    db.session.commit()
+    db.session.add_all([_rent(renter, tux, date(2021, 3, 5), '40.00'),
+                        _rent(other, tux, today, '25.50'),
+                        _rent(renter, gown, today, '60.00')])
+    db.session.commit()
+
+    # an owner change flushed together with a new rental of the product
+    tux.owner_id = second.user_id
+    db.session.add(_rent(other, tux, today - timedelta(days=1), '10.00'))
+    db.session.commit()
+
+    totals = {row.user_id: row for row in UserTotals.query}
+    assert totals[first.user_id].owner_revenue == Decimal('60.00')
+    assert totals[first.user_id].items_listed == 1
+    assert totals[second.user_id].owner_revenue == Decimal('75.50')
+    assert totals[second.user_id].items_listed == 1
+    _assert_matches_rebuild()
+
+
+def test_deleting_a_product_drops_its_archived_revenue(users):
+    owner, _, renter, _ = users
+    tux = Product(name='Tux', category='mens', rental_price=20, available_quantity=1, owner_id=owner.user_id)
+    db.session.add(tux)
+    db.session.commit()
+    db.session.add(_rent(renter, tux, date.today(), '25.00'))
+    # as `flask archive` would have left an old rental of it
+    db.session.add(RentalArchive(rental_id=1000, renter_id=renter.user_id, product_id=tux.product_id,
+                                 rental_start=date(2020, 1, 10), rental_end=date(2020, 1, 12),
+                                 total_cost=Decimal('40.00'), status='completed'))
+    db.session.commit()
+    rebuild_user_rollups()
+    assert db.session.get(UserTotals, owner.user_id).owner_revenue == Decimal('65.00')
+
+    db.session.delete(tux)
+    db.session.commit()
+
+    assert db.session.get(UserTotals, owner.user_id).owner_revenue == 0
+    _assert_matches_rebuild()
+
+
+def _earnings(client, user, **args):
+    return client.get('/owner_earnings', query_string={'user_id': user.user_id, 'format': 'json', **args})
+
+
+def test_compaction_folds_old_days_into_months(client, users):
+    owner, _, renter, _ = users
+    today = date.today()
+    tux = Product(name='Tux', category='mens', rental_price=20, available_quantity=1, owner_id=owner.user_id)
+    db.session.add(tux)
+    db.session.commit()
+    db.session.add_all([_rent(renter, tux, date(2022, 1, 3), '10.00'),
+                        _rent(renter, tux, date(2022, 1, 20), '15.00'),
+                        _rent(renter, tux, date(2022, 2, 7), '30.00'),
+                        _rent(renter, tux, today, '5.00')])
+    db.session.commit()
+    totals = _rollups()[1]
+
+    compact_user_rollups()
+
+    stored = {(r.bucket, r.period): r.owner_revenue for r in UserRollup.query.filter_by(user_id=owner.user_id)}
+    assert stored == {(date(2022, 1, 1), 'month'): Decimal('25.00'),
+                      (date(2022, 2, 1), 'month'): Decimal('30.00'),
+                      (today, 'day'): Decimal('5.00')}
+    assert _rollups()[1] == totals
+
+    january = _earnings(client, owner, start='2022-01-01', end='2022-02-01').get_json()
+    assert january['totals']['owner_revenue'] == '25.00'
+    assert january['totals']['rental_count'] == 0
+    renter_january = _earnings(client, renter, start='2022-01-01', end='2022-03-01', by='month').get_json()
+    assert [(b['bucket'], b['renter_spend']) for b in renter_january['buckets']] == [
+        ('2022-01-01', '25.00'), ('2022-02-01', '30.00')]
+
+    # a range cutting a compacted month would count all of it, or none of it
+    for start, end in (('2022-01-15', '2022-03-01'), ('2022-01-01', '2022-02-10')):
+        response = _earnings(client, owner, start=start, end=end)
+        assert response.status_code == 400, (start, end)
+    # recent history is still kept per day
+    recent = _earnings(client, owner, start=(today - timedelta(days=3)).isoformat(),
+                       end=(today + timedelta(days=1)).isoformat()).get_json()
+    assert recent['totals']['owner_revenue'] == '5.00'
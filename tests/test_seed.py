@@ -0,0 +1,10 @@
+from app import Product, User
+
+
+def test_seed_command_reports_rows_per_second(app, tmp_path):
+    result = app.test_cli_runner().invoke(args=['seed', '--scale', '0.001', '--seed', '7'])
+
+    assert result.exit_code == 0, result.output
+    reports = [line for line in result.output.splitlines() if line.endswith('rows/s)')]
+    assert {line.split(':')[0] for line in reports} >= {'Users', 'Products', 'Rentals'}
+    assert User.query.count() and Product.query.count()